@@ -0,0 +1,170 @@
+"""
+ML Interview Assistant - Bulk JSONL Processing
+Answers or reviews every row of a JSONL file in model batches, streaming
+results to a JSONL output that doubles as a resume checkpoint.
+"""
+
+import argparse
+import json
+import os
+from itertools import islice
+
+from model_loader import ModelLoader
+from interview_functions import ANSWER_ERROR, REVIEW_ERROR, InterviewFunctions
+from file_utils import FileUtils
+from replica_pool import ReplicaPool
+
+
+def read_rows(input_path):
+    """Yields (line_number, row) for every non-empty JSONL input line."""
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {line_number}: invalid JSON - {e}")
+                continue
+            if not isinstance(row, dict) or not row.get("question"):
+                print(f"Skipping line {line_number}: missing 'question'")
+                continue
+            yield line_number, row
+
+
+def load_checkpoint(output_path):
+    """Returns the input line numbers already written to the output file.
+
+    Rows written with an 'error' field are not counted, so they are retried.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r+b") as f:
+        complete = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            complete += len(line)
+            try:
+                result = json.loads(line)
+                if not result.get("error"):
+                    done.add(result["line"])
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+        # A run killed mid-write leaves a partial last line; drop it so new
+        # results start on a fresh line
+        f.truncate(complete)
+    return done
+
+
+def process_batch(interview_functions, batch):
+    """Rows with a candidate 'answer' are reviewed, the others are answered."""
+    to_answer = [(n, row) for n, row in batch if not row.get("answer")]
+    to_review = [(n, row) for n, row in batch if row.get("answer")]
+    results = {}
+
+    if to_answer:
+        answers = interview_functions.answer_questions([row["question"] for _, row in to_answer])
+        for (n, row), answer in zip(to_answer, answers):
+            if answer == ANSWER_ERROR:
+                results[n] = {**row, "line": n, "task": "answer", "error": answer}
+            else:
+                results[n] = {**row, "line": n, "task": "answer", "model_answer": answer}
+    if to_review:
+        reviews = interview_functions.review_answers([(row["question"], row["answer"]) for _, row in to_review])
+        for (n, row), review in zip(to_review, reviews):
+            if review == REVIEW_ERROR:
+                results[n] = {**row, "line": n, "task": "review", "error": review}
+            else:
+                results[n] = {**row, "line": n, "task": "review", "review": review}
+
+    return [results[n] for n, _ in batch]
+
+
+def run(interview_functions, input_path, output_path, batch_size=8):
+    done = load_checkpoint(output_path)
+    if done:
+        print(f"Resuming: {len(done)} rows already processed")
+
+    rows = ((n, row) for n, row in read_rows(input_path) if n not in done)
+    processed = 0
+    failed = 0
+    with open(output_path, "a", encoding="utf-8") as out:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            for result in process_batch(interview_functions, batch):
+                failed += "error" in result
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+            processed += len(batch)
+            print(f"Processed {processed} rows (through line {batch[-1][0]})")
+    if failed:
+        print(f"{failed} rows failed; re-run to retry them")
+    return processed
+
+
+def save_markdown_report(output_path, file_utils):
+    qa_pairs = []
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if result.get("error"):
+                continue
+            if result.get("task") == "review":
+                qa_pairs.append({"question": result["question"], "answer": result["answer"], "review": result["review"]})
+            else:
+                qa_pairs.append({"question": result["question"], "answer": result["model_answer"]})
+    return file_utils.save_qa_session_to_md(qa_pairs)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Answer or review JSONL rows in bulk")
+    parser.add_argument("input", help="JSONL file with 'question' and optional candidate 'answer' per row")
+    parser.add_argument("output", help="JSONL results file; re-running resumes from it")
+    parser.add_argument("--model", default="Qwen/Qwen2.5-0.5B-Instruct", help="Base model name")
+    parser.add_argument("--profile", choices=["default", "cpu"], default="default")
+    parser.add_argument("--quantize", action="store_true")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Shard batches across this many model worker processes (cpu profile)")
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--markdown", action="store_true",
+                        help="Also write a Markdown Q&A report when the run finishes")
+    parser.add_argument("--pdf", action="store_true", help="Also convert the Markdown report to PDF")
+    return parser.parse_args()
+
+
+def main():
+    """Bulk processing entry point"""
+    args = parse_args()
+    if args.workers:
+        # The pool exposes the same batch methods as InterviewFunctions
+        pool = ReplicaPool(args.workers, args.threads_per_worker, batch_size=args.batch_size,
+                           loader_options={"base_model_name": args.model, "quantize": args.quantize})
+        with pool:
+            run(pool, args.input, args.output, args.batch_size * args.workers)
+    else:
+        model_loader = ModelLoader(base_model_name=args.model, profile=args.profile,
+                                   quantize=args.quantize, num_threads=args.threads)
+        interview_functions = InterviewFunctions(model_loader.load_model(), batch_size=args.batch_size)
+        run(interview_functions, args.input, args.output, args.batch_size)
+
+    if args.markdown or args.pdf:
+        file_utils = FileUtils()
+        md_file = save_markdown_report(args.output, file_utils)
+        if args.pdf:
+            file_utils.save_to_pdf(md_file)
+        file_utils.close()
+
+
+if __name__ == "__main__":
+    main()
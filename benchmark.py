@@ -0,0 +1,236 @@
+"""
+ML Interview Assistant - Benchmarks
+Measures load time, time-to-first-token, decode tokens/sec, latency
+percentiles and peak memory for every entry point, offline on CPU, using
+tiny randomly-initialized models with the Qwen2 and Llama architectures.
+"""
+
+import os
+
+# Stand-in models are built locally; never reach out to the Hub
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import torch
+import transformers
+from transformers import AutoModelForCausalLM, AutoTokenizer, LlamaConfig, Qwen2Config
+from peft import LoraConfig, TaskType, get_peft_model
+
+from model_loader import ModelLoader
+from interview_functions import InterviewFunctions
+from file_utils import FileUtils
+from generation_utils import GenerationTimer
+from metrics import peak_rss_mb, percentiles, reset_peak_rss
+
+
+# Tokenizers ship with the adapters, so the stand-ins use the real vocabularies
+STAND_INS = {
+    "qwen": (Qwen2Config, "./qwen-lora-ftuned-adapted/"),
+    "tinyllama": (LlamaConfig, "./tinyllama-lora-ftuned-adapted-v2/"),
+}
+
+
+def build_stand_in(arch, out_dir):
+    """Saves a tiny random base model and a LoRA adapter (r=8, q_proj/v_proj)."""
+    config_class, tokenizer_dir = STAND_INS[arch]
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_dir)
+    config = config_class(
+        vocab_size=len(tokenizer),
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=2048,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+    )
+    torch.manual_seed(0)
+    model = AutoModelForCausalLM.from_config(config)
+
+    base_dir = os.path.join(out_dir, f"{arch}-base")
+    adapter_dir = os.path.join(out_dir, f"{arch}-adapter")
+    model.save_pretrained(base_dir)
+    tokenizer.save_pretrained(base_dir)
+
+    lora_config = LoraConfig(r=8, lora_alpha=16, target_modules=["q_proj", "v_proj"],
+                             lora_dropout=0.05, bias="none", task_type=TaskType.CAUSAL_LM)
+    get_peft_model(model, lora_config).save_pretrained(adapter_dir)
+    return base_dir, adapter_dir
+
+
+class TimedPipeline:
+    """Wraps a chat pipeline and keeps a GenerationTimer for every call."""
+
+    def __init__(self, chat_pipeline):
+        self.chat_pipeline = chat_pipeline
+        self.model = chat_pipeline.model
+        self.tokenizer = chat_pipeline.tokenizer
+        self.calls = []
+
+    def __call__(self, prompts, **generate_kwargs):
+        timer = GenerationTimer(generate_kwargs.get("streamer"))
+        generate_kwargs["streamer"] = timer
+        start = time.perf_counter()
+        result = self.chat_pipeline(prompts, **generate_kwargs)
+        self.calls.append((start, timer))
+        return result
+
+
+def measure(fn, runs, timed_pipeline=None):
+    latencies, ttfts, decode_rates = [], [], []
+    reset_peak_rss()
+    for _ in range(runs):
+        if timed_pipeline is not None:
+            timed_pipeline.calls.clear()
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+        if timed_pipeline is None:
+            continue
+        for call_start, timer in timed_pipeline.calls:
+            if timer.first_token_time is None:
+                continue
+            ttfts.append(timer.first_token_time - call_start)
+            decode_time = timer.last_token_time - timer.first_token_time
+            if decode_time > 0:
+                decode_rates.append((timer.tokens - timer.first_step_tokens) / decode_time)
+
+    result = {"runs": runs, "latency_s": percentiles(latencies), "peak_rss_mb": peak_rss_mb()}
+    if ttfts:
+        result["ttft_s"] = percentiles(ttfts)
+    if decode_rates:
+        result["decode_tokens_per_s"] = percentiles(decode_rates)
+    return result
+
+
+def benchmark_arch(arch, work_dir, args):
+    base_dir, adapter_dir = build_stand_in(arch, work_dir)
+    cache_dir = os.path.join(work_dir, f"{arch}-cache")
+    loader_options = {
+        "base_model_name": base_dir,
+        "adapter_path": adapter_dir,
+        "cache_dir": cache_dir,
+        "profile": "cpu",
+        "num_threads": args.threads,
+        "compile_generation": args.compile,
+    }
+    results = {}
+
+    # Cold: merge the adapter and write the cache; warm: load the cache
+    for label in ("load_model_cold", "load_model_warm"):
+        if label == "load_model_cold":
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        reset_peak_rss()
+        start = time.perf_counter()
+        model_loader = ModelLoader(**loader_options)
+        chat_pipeline = model_loader.load_model()
+        results[label] = {"latency_s": time.perf_counter() - start, "peak_rss_mb": peak_rss_mb()}
+
+    timed_pipeline = TimedPipeline(chat_pipeline)
+    # Fixed budgets without stop strings keep runs comparable over time
+    budgets = {mode: args.max_new_tokens for mode in ("question", "practice_question", "question_alternative",
+                                                      "answer", "review")}
+    interview_functions = InterviewFunctions(
+        timed_pipeline,
+        batch_size=args.batch_size,
+        max_new_tokens=budgets,
+        stop_strings={mode: [] for mode in budgets},
+        static_cache=model_loader.static_cache
+    )
+    question = "What is the difference between bias and variance?"
+    candidate = "Bias is error from wrong assumptions, variance is sensitivity to the training data."
+
+    results["generate_question"] = measure(interview_functions.generate_question, args.runs, timed_pipeline)
+    results["generate_question_batch"] = measure(
+        lambda: interview_functions.generate_question_batch(args.batch_size), args.runs, timed_pipeline
+    )
+    results["answer_question"] = measure(lambda: interview_functions.answer_question(question),
+                                         args.runs, timed_pipeline)
+    results["review_answer"] = measure(lambda: interview_functions.review_answer(question, candidate),
+                                       args.runs, timed_pipeline)
+
+    # Same calls with prompt-lookup decoding, for comparison
+    lookup_functions = InterviewFunctions(
+        timed_pipeline,
+        max_new_tokens=budgets,
+        stop_strings={mode: [] for mode in budgets},
+        prompt_lookup_num_tokens=args.prompt_lookup,
+        static_cache=model_loader.static_cache
+    )
+    results["answer_question_prompt_lookup"] = measure(lambda: lookup_functions.answer_question(question),
+                                                       args.runs, timed_pipeline)
+    results["review_answer_prompt_lookup"] = measure(lambda: lookup_functions.review_answer(question, candidate),
+                                                     args.runs, timed_pipeline)
+
+    file_utils = FileUtils(output_dir=os.path.join(work_dir, "output"))
+    questions = interview_functions.generate_question_batch(args.batch_size)
+    md_file = file_utils.save_questions_to_md(questions)
+    if file_utils.save_to_pdf(md_file) is None:
+        results["save_to_pdf"] = {"skipped": "markdown2/weasyprint not available"}
+    else:
+        results["save_to_pdf"] = measure(lambda: file_utils.save_to_pdf(md_file), args.runs)
+    file_utils.close()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark LoRAview entry points offline on CPU")
+    parser.add_argument("--archs", nargs="+", choices=sorted(STAND_INS), default=sorted(STAND_INS))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--compile", action="store_true", help="Benchmark the compiled static-cache generation path")
+    parser.add_argument("--prompt-lookup", type=int, default=10,
+                        help="Draft tokens per step for the prompt-lookup runs")
+    parser.add_argument("--output-dir", default="./bench_results")
+    return parser.parse_args()
+
+
+def main():
+    """Benchmark entry point"""
+    args = parse_args()
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "config": vars(args),
+        "results": {},
+    }
+
+    work_dir = tempfile.mkdtemp(prefix="loraview-bench-")
+    try:
+        for arch in args.archs:
+            print(f"\n=== Benchmarking {arch} stand-in ===")
+            report["results"][arch] = benchmark_arch(arch, work_dir, args)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nBenchmark results saved to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
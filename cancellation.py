@@ -0,0 +1,43 @@
+import threading
+
+
+class GenerationCancelled(BaseException):
+    # Like KeyboardInterrupt, not swallowed by the "except Exception" handlers
+    # that turn generation errors into error strings
+    pass
+
+
+class CancellationToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def cancelled(self):
+        return self._event.is_set()
+
+
+def run_cancellable(fn, token):
+    # Runs fn on a worker thread; a Ctrl-C while waiting cancels the token,
+    # waits for the worker to stop at its next decode step and re-raises
+    result = {}
+
+    def target():
+        try:
+            result["value"] = fn()
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    try:
+        while thread.is_alive():
+            thread.join(0.1)
+    except KeyboardInterrupt:
+        token.cancel()
+        thread.join()
+        raise
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
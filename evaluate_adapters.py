@@ -0,0 +1,227 @@
+"""
+ML Interview Assistant - Adapter Evaluation
+Runs the held-out test split through the deployed inference path for every
+loading variant (merged/unmerged adapter, fp32/bf16/int8, Qwen/TinyLlama)
+and reports perplexity next to tokens/sec and memory.
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import torch
+
+from model_loader import ADAPTER_PATHS, ModelLoader
+from interview_functions import InterviewFunctions
+from lora_trainer import PROMPT_TEMPLATE, assign_split, iter_json_array, iter_jsonl
+from metrics import GenerationMetrics, peak_rss_mb, reset_peak_rss
+
+
+BASE_MODELS = {
+    "qwen": "Qwen/Qwen2.5-0.5B-Instruct",
+    "tinyllama": "TinyLlama/TinyLlama-1.1B-Chat-v1.0",
+}
+DTYPES = {
+    "fp32": (torch.float32, False),
+    "bf16": (torch.bfloat16, False),
+    "int8": (torch.float32, True),
+}
+
+
+def load_test_rows(data_path, limit):
+    """The test split of LoRATrainer, read the same streaming way."""
+    rows = iter_jsonl(data_path) if data_path.endswith(".jsonl") else iter_json_array(data_path)
+    test_rows = (
+        {"instruction": row["instruction"], "response": row["response"]}
+        for row in rows
+        if isinstance(row, dict) and "instruction" in row and "response" in row
+        and assign_split(row["instruction"], row["response"]) == "test"
+    )
+    return list(islice(test_rows, limit))
+
+
+def build_variants(archs, merges, dtypes):
+    variants = []
+    for arch in archs:
+        for merge in merges:
+            for dtype in dtypes:
+                # Dynamic int8 quantization only applies to a merged model
+                if dtype == "int8" and merge == "unmerged":
+                    continue
+                variants.append({"arch": arch, "merge": merge, "dtype": dtype})
+    return variants
+
+
+def perplexity(model, tokenizer, rows, batch_size):
+    """Token-level perplexity of template + response, as in training; also returns scoring tokens/sec."""
+    eos = tokenizer.eos_token
+    texts = [PROMPT_TEMPLATE.format(row["instruction"], row["response"]) + eos for row in rows]
+    # Right padding keeps positions aligned with training for the loss
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = "right"
+    total_nll, total_tokens, elapsed = 0.0, 0, 0.0
+    try:
+        for i in range(0, len(texts), batch_size):
+            inputs = tokenizer(texts[i:i + batch_size], return_tensors="pt", padding=True,
+                               truncation=True, max_length=512, add_special_tokens=False).to(model.device)
+            labels = inputs["input_ids"].masked_fill(inputs["attention_mask"] == 0, -100)
+            start = time.perf_counter()
+            with torch.no_grad():
+                logits = model(**inputs).logits
+            elapsed += time.perf_counter() - start
+            shift_logits = logits[:, :-1].float()
+            shift_labels = labels[:, 1:]
+            total_nll += torch.nn.functional.cross_entropy(
+                shift_logits.reshape(-1, shift_logits.size(-1)), shift_labels.reshape(-1),
+                ignore_index=-100, reduction="sum"
+            ).item()
+            total_tokens += int((shift_labels != -100).sum())
+    finally:
+        tokenizer.padding_side = padding_side
+
+    try:
+        ppl = math.exp(total_nll / total_tokens)
+    except (OverflowError, ZeroDivisionError):
+        ppl = float("inf")
+    return ppl, total_tokens / elapsed if elapsed else None
+
+
+def evaluate_variant(variant, rows, options):
+    """Runs in a fresh process per variant so peak memory is not carried over."""
+    dtype, quantize = DTYPES[variant["dtype"]]
+    reset_peak_rss()
+    start = time.perf_counter()
+    base_model_name = BASE_MODELS[variant["arch"]]
+    model_loader = ModelLoader(
+        base_model_name=base_model_name,
+        adapter_path=ADAPTER_PATHS[base_model_name],
+        merge_adapter=variant["merge"] == "merged",
+        profile="cpu",
+        torch_dtype=dtype,
+        quantize=quantize,
+        num_threads=options["threads"]
+    )
+    chat_pipeline = model_loader.load_model()
+    result = {
+        **variant,
+        "load_s": time.perf_counter() - start,
+        "runtime_config": model_loader.runtime_config,
+        "model_footprint_mb": model_loader.model.get_memory_footprint() / 1024 ** 2,
+    }
+
+    result["perplexity"], result["score_tokens_per_s"] = perplexity(
+        model_loader.model, model_loader.tokenizer, rows, options["batch_size"]
+    )
+
+    # Answers go through the same batched path as the server and bulk runner,
+    # with a fixed budget and no stop strings so variants are comparable
+    metrics = GenerationMetrics(log_path=None)
+    interview_functions = InterviewFunctions(
+        chat_pipeline,
+        batch_size=options["batch_size"],
+        max_new_tokens={"answer": options["max_new_tokens"]},
+        stop_strings={"answer": []},
+        metrics=metrics
+    )
+    questions = [row["instruction"] for row in rows[:options["generate_rows"]]]
+    start = time.perf_counter()
+    for i in range(0, len(questions), options["batch_size"]):
+        interview_functions.answer_questions(questions[i:i + options["batch_size"]])
+    generate_s = time.perf_counter() - start
+
+    totals = {}
+    for (name, (mode, status)), value in metrics.totals.items():
+        if status == "ok":
+            totals[name] = totals.get(name, 0) + value
+    generated = totals.get("generated_tokens", 0)
+    decode_s = totals.get("decode_seconds", 0)
+    result["generate_s"] = generate_s
+    result["generated_tokens"] = generated
+    result["generate_tokens_per_s"] = generated / generate_s if generate_s else None
+    result["decode_tokens_per_s"] = generated / decode_s if decode_s else None
+    result["prefill_s"] = totals.get("prefill_seconds")
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def print_table(results):
+    columns = [("variant", 26), ("ppl", 9), ("score tok/s", 12), ("gen tok/s", 10), ("peak MB", 9), ("model MB", 9)]
+    print("\n" + "".join(name.ljust(width) for name, width in columns))
+    for r in results:
+        if "error" in r:
+            print(f"{r['arch']}/{r['merge']}/{r['dtype']}".ljust(26) + f"ERROR: {r['error']}")
+            continue
+        values = [
+            f"{r['arch']}/{r['merge']}/{r['dtype']}",
+            f"{r['perplexity']:.3f}",
+            f"{r['score_tokens_per_s'] or 0:.0f}",
+            f"{r['generate_tokens_per_s'] or 0:.1f}",
+            f"{r['peak_rss_mb']:.0f}",
+            f"{r['model_footprint_mb']:.0f}",
+        ]
+        print("".join(value.ljust(width) for value, (_, width) in zip(values, columns)))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare adapter loading variants on quality vs latency")
+    parser.add_argument("data", help="Interview dataset ({'questions': [...]} JSON or JSONL), as used for training")
+    parser.add_argument("--archs", nargs="+", choices=sorted(BASE_MODELS), default=sorted(BASE_MODELS))
+    parser.add_argument("--merge", nargs="+", choices=["merged", "unmerged"], default=["merged", "unmerged"])
+    parser.add_argument("--dtypes", nargs="+", choices=sorted(DTYPES), default=["fp32", "bf16", "int8"])
+    parser.add_argument("--limit", type=int, default=200, help="Test rows scored for perplexity")
+    parser.add_argument("--generate-rows", type=int, default=32, help="Test rows answered for generation speed")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output-dir", default="./eval_results")
+    return parser.parse_args()
+
+
+def main():
+    """Evaluation entry point"""
+    args = parse_args()
+    rows = load_test_rows(args.data, args.limit)
+    if not rows:
+        print(f"No test rows found in {args.data}")
+        return
+    print(f"Evaluating on {len(rows)} test rows")
+
+    options = {
+        "batch_size": args.batch_size,
+        "max_new_tokens": args.max_new_tokens,
+        "generate_rows": args.generate_rows,
+        "threads": args.threads,
+    }
+    results = []
+    for variant in build_variants(args.archs, args.merge, args.dtypes):
+        print(f"\n=== {variant['arch']} / {variant['merge']} / {variant['dtype']} ===")
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                results.append(executor.submit(evaluate_variant, variant, rows, options).result())
+        except Exception as e:
+            print(f"ERROR in evaluate_variant: {e}")
+            results.append({**variant, "error": str(e)})
+
+    print_table(results)
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "data": args.data,
+        "test_rows": len(rows),
+        "config": vars(args),
+        "results": results,
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, f"eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nEvaluation results saved to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,138 +3,147 @@ from datetime import datetime
 from pathlib import Path
 
 
+# Session kinds: (file name prefix, Markdown title, date label, entry writer name)
+SESSION_KINDS = {
+    "questions": ("ml_questions", "Machine Learning Interview Questions", "Generated on", "_write_question"),
+    "qa": ("qa_session", "Q&A Session", "Session date", "_write_qa"),
+    "practice": ("practice_session", "Practice Session Report", "Session date", "_write_practice"),
+}
+
+
 class FileUtils:
-    def __init__(self, output_dir="./output"):
+    def __init__(self, output_dir="./output", question_bank=None):
         self.output_dir = output_dir
+        # Optional QuestionBank that saved questions are also recorded in
+        self.question_bank = question_bank
+        # Journal path -> (Markdown path, journal byte offset, entries rendered)
+        self.rendered = {}
+        # Created on the first PDF export (see save_to_pdf)
+        self.pdf_exporter = None
         self.ensure_output_dir()
     
     def ensure_output_dir(self):
         Path(self.output_dir).mkdir(parents=True, exist_ok=True)
     
-    def save_questions_to_md(self, questions, filename=None):
-        if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"ml_questions_{timestamp}.md"
+    def _write_header(self, f, kind):
+        _, title, date_label, _ = SESSION_KINDS[kind]
+        f.write(f"# {title}\n\n")
+        f.write(f"{date_label}: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+    
+    def _write_question(self, f, i, q):
+        f.write(f"## Question {i}\n\n")
+        f.write(f"{q['question']}\n\n")
         
-        filepath = os.path.join(self.output_dir, filename)
+        if 'category' in q and q['category']:
+            f.write(f"**Category:** {q['category']}\n\n")
+        if 'timestamp' in q:
+            f.write(f"**Generated:** {q['timestamp']}\n\n")
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write("# Machine Learning Interview Questions\n\n")
-            f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            
-            for i, q in enumerate(questions, 1):
-                f.write(f"## Question {i}\n\n")
-                f.write(f"{q['question']}\n\n")
-                
-                if 'category' in q and q['category']:
-                    f.write(f"**Category:** {q['category']}\n\n")
-                if 'timestamp' in q:
-                    f.write(f"**Generated:** {q['timestamp']}\n\n")
-                
-                f.write("---\n\n")
+        f.write("---\n\n")
+    
+    def _write_qa(self, f, i, qa):
+        f.write(f"## Q&A {i}\n\n")
+        f.write(f"**Question:** {qa['question']}\n\n")
+        f.write(f"**Answer:** {qa['answer']}\n\n")
         
-        print(f"Questions saved to: {filepath}")
-        return filepath
+        if 'review' in qa and qa['review']:
+            f.write(f"**Review:** {qa['review']}\n\n")
+        
+        f.write("---\n\n")
     
-    def save_qa_session_to_md(self, qa_pairs, filename=None):
+    def _write_practice(self, f, i, practice):
+        f.write(f"## Practice Question {i}\n\n")
+        f.write(f"**Question:** {practice['question']}\n\n")
+        
+        if 'model_answer' in practice and practice['model_answer']:
+            f.write(f"**Model Answer:** {practice['model_answer']}\n\n")
+        
+        if 'user_answer' in practice and practice['user_answer']:
+            f.write(f"**Your Answer:** {practice['user_answer']}\n\n")
+        
+        if 'review' in practice and practice['review']:
+            f.write(f"**Review:** {practice['review']}\n\n")
+        
+        f.write("---\n\n")
+    
+    def _save_entries(self, kind, entries, filename):
         if filename is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"qa_session_{timestamp}.md"
+            filename = f"{SESSION_KINDS[kind][0]}_{timestamp}.md"
         
         filepath = os.path.join(self.output_dir, filename)
+        write_entry = getattr(self, SESSION_KINDS[kind][3])
         
         with open(filepath, 'w', encoding='utf-8') as f:
-            f.write("# Q&A Session\n\n")
-            f.write(f"Session date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            
-            for i, qa in enumerate(qa_pairs, 1):
-                f.write(f"## Q&A {i}\n\n")
-                f.write(f"**Question:** {qa['question']}\n\n")
-                f.write(f"**Answer:** {qa['answer']}\n\n")
-                
-                if 'review' in qa and qa['review']:
-                    f.write(f"**Review:** {qa['review']}\n\n")
-                
-                f.write("---\n\n")
-        
+            self._write_header(f, kind)
+            for i, entry in enumerate(entries, 1):
+                write_entry(f, i, entry)
+        return filepath
+    
+    def _add_to_question_bank(self, questions):
+        if self.question_bank is not None:
+            added = sum(question_id is not None for question_id in self.question_bank.add_many(questions))
+            print(f"Added {added} new questions to the question bank")
+    
+    def save_questions_to_md(self, questions, filename=None):
+        filepath = self._save_entries("questions", questions, filename)
+        print(f"Questions saved to: {filepath}")
+        self._add_to_question_bank([q['question'] for q in questions])
+        return filepath
+    
+    def save_qa_session_to_md(self, qa_pairs, filename=None):
+        filepath = self._save_entries("qa", qa_pairs, filename)
         print(f"Q&A session saved to: {filepath}")
         return filepath
     
     def save_practice_session(self, practice_data, filename=None):
-        if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"practice_session_{timestamp}.md"
-        
-        filepath = os.path.join(self.output_dir, filename)
+        filepath = self._save_entries("practice", practice_data, filename)
+        print(f"Practice session saved to: {filepath}")
+        return filepath
+    
+    def open_journal(self, kind):
+        from session_journal import SessionJournal
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return SessionJournal(os.path.join(self.output_dir, "journals", f"{SESSION_KINDS[kind][0]}_{timestamp}.jsonl"))
+    
+    def save_journal_to_md(self, journal, kind):
+        # Renders only the journal entries added since the last save, appending
+        # them to the session's Markdown file
+        filepath = os.path.join(self.output_dir, os.path.splitext(os.path.basename(journal.path))[0] + ".md")
+        md_path, offset, count = self.rendered.get(journal.path, (None, 0, 0))
+        if md_path != filepath or not os.path.exists(filepath):
+            offset, count = 0, 0
+            with open(filepath, 'w', encoding='utf-8') as f:
+                self._write_header(f, kind)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write("# Practice Session Report\n\n")
-            f.write(f"Session date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            
-            for i, practice in enumerate(practice_data, 1):
-                f.write(f"## Practice Question {i}\n\n")
-                f.write(f"**Question:** {practice['question']}\n\n")
-                f.write(f"**Model Answer:** {practice['model_answer']}\n\n")
-                
-                if 'user_answer' in practice and practice['user_answer']:
-                    f.write(f"**Your Answer:** {practice['user_answer']}\n\n")
-                
-                if 'review' in practice and practice['review']:
-                    f.write(f"**Review:** {practice['review']}\n\n")
-                
-                f.write("---\n\n")
+        write_entry = getattr(self, SESSION_KINDS[kind][3])
+        new_entries = []
+        with open(filepath, 'a', encoding='utf-8') as f:
+            for offset, entry in journal.read_from(offset):
+                count += 1
+                write_entry(f, count, entry)
+                if kind == "questions":
+                    new_entries.append(entry['question'])
+        self.rendered[journal.path] = (filepath, offset, count)
         
-        print(f"Practice session saved to: {filepath}")
+        print(f"Session saved to: {filepath} ({count} entries)")
+        if kind == "questions":
+            self._add_to_question_bank(new_entries)
         return filepath
     
-    def save_to_pdf(self, md_filepath):
-        try:
-            import markdown2
-            from weasyprint import HTML, CSS
-            from weasyprint.text.fonts import FontConfiguration
-            
-            # Read markdown content
-            with open(md_filepath, 'r', encoding='utf-8') as f:
-                md_content = f.read()
-            
-            # Convert to HTML
-            html_content = markdown2.markdown(md_content)
-            
-            # Create full HTML document (for styling)
-            full_html = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <title>ML Interview Questions</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 40px; line-height: 1.6; }}
-                    h1 {{ color: #2c3e50; border-bottom: 2px solid #3498db; }}
-                    h2 {{ color: #34495e; margin-top: 30px; }}
-                    code {{ background-color: #f8f9fa; padding: 2px 4px; border-radius: 3px; }}
-                    pre {{ background-color: #f8f9fa; padding: 15px; border-radius: 5px; overflow-x: auto; }}
-                </style>
-            </head>
-            <body>
-                {html_content}
-            </body>
-            </html>
-            """
-            
-            # Generate PDF filename
-            pdf_filename = md_filepath.replace('.md', '.pdf')
-            
-            # Convert to PDF
-            font_config = FontConfiguration()
-            HTML(string=full_html).write_pdf(pdf_filename, font_config=font_config)
-            
-            print(f"PDF saved to: {pdf_filename}")
-            return pdf_filename
-            
-        except ImportError:
-            print("PDF generation requires markdown2 and weasyprint packages.")
-            print("Install with: pip install markdown2 weasyprint")
-            return None
-        except Exception as e:
-            print(f"Error generating PDF: {e}")
-            return None 
\ No newline at end of file
+    def save_to_pdf(self, md_filepath, background=False):
+        # Rendering runs in PdfExporter worker processes; with background=True
+        # this returns a future instead of waiting for the PDF
+        if self.pdf_exporter is None:
+            from pdf_export import PdfExporter
+            self.pdf_exporter = PdfExporter()
+        if background:
+            print(f"Exporting PDF in the background: {md_filepath}")
+            return self.pdf_exporter.submit(md_filepath)
+        return self.pdf_exporter.export(md_filepath)
+    
+    def close(self):
+        # Waits for background PDF exports to finish
+        if self.pdf_exporter is not None:
+            self.pdf_exporter.close()
+            self.pdf_exporter = None
@@ -0,0 +1,164 @@
+import copy
+import gc
+import time
+
+import torch
+from peft import PeftModel
+from transformers import DynamicCache, StoppingCriteria, StoppingCriteriaList
+from transformers.generation.streamers import BaseStreamer
+
+
+class StopOnStrings(StoppingCriteria):
+    """Stops each sequence as soon as its generated text contains a stop string."""
+
+    def __init__(self, stop_strings, tokenizer, prompt_length):
+        self.stop_strings = list(stop_strings)
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        # Each step decodes the tokens added since the previous step (several
+        # with prompt-lookup decoding) plus a window long enough to hold the
+        # longest stop string, so a stop string spanning steps is still seen.
+        self.window = max(len(tokenizer.encode(s, add_special_tokens=False)) for s in self.stop_strings) + 2
+        self.seen_length = prompt_length
+
+    def __call__(self, input_ids, scores, **kwargs):
+        start = max(self.prompt_length, min(self.seen_length, input_ids.shape[1]) - self.window)
+        self.seen_length = input_ids.shape[1]
+        tails = self.tokenizer.batch_decode(input_ids[:, start:], skip_special_tokens=True)
+        done = [any(s in tail for s in self.stop_strings) for tail in tails]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class StopOnCancel(StoppingCriteria):
+    """Stops every sequence at the next decode step once the token is cancelled."""
+
+    def __init__(self, token):
+        self.token = token
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.token.cancelled(), dtype=torch.bool, device=input_ids.device)
+
+
+class GenerationTimer(BaseStreamer):
+    """Streamer that timestamps generated tokens, optionally forwarding to another streamer.
+
+    generate() first puts the prompt ids, then the new tokens of every step,
+    so the first token time separates prefill from decode.
+    """
+
+    def __init__(self, inner=None):
+        self.inner = inner
+        self.prompt_seen = False
+        self.first_token_time = None
+        self.last_token_time = None
+        self.tokens = 0
+        self.first_step_tokens = 0
+
+    def put(self, value):
+        if self.prompt_seen:
+            now = time.perf_counter()
+            if self.first_token_time is None:
+                self.first_token_time = now
+                self.first_step_tokens = value.numel()
+            self.last_token_time = now
+            self.tokens += value.numel()
+        self.prompt_seen = True
+        if self.inner is not None:
+            self.inner.put(value)
+
+    def end(self):
+        if self.inner is not None:
+            self.inner.end()
+
+
+class PrefixKVCache:
+    """KV caches for the fixed prefixes of the prompt templates.
+
+    Each prefix is prefilled once; a call whose prompt starts with a cached
+    prefix gets a copy of that cache, so generate() only prefills the rest.
+    Entries are kept per active LoRA adapter, since the adapter changes the
+    cached values.
+    """
+
+    def __init__(self, model, tokenizer):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.entries = {}
+
+    def _active_adapter(self):
+        return self.model.active_adapter if isinstance(self.model, PeftModel) else None
+
+    def add(self, prefix):
+        # The last prefix token is left out: it may merge with the variable
+        # text that follows, and generate() needs at least one new token.
+        ids = self.tokenizer(prefix, return_tensors="pt")["input_ids"][:, :-1]
+        if ids.shape[1] == 0:
+            return
+        cache = DynamicCache()
+        with torch.no_grad():
+            self.model(input_ids=ids.to(self.model.device), past_key_values=cache, use_cache=True)
+        self.entries[(self._active_adapter(), prefix)] = (ids[0].tolist(), cache)
+
+    def warm(self, prefixes):
+        for prefix in prefixes:
+            self.add(prefix)
+
+    def lookup(self, prompt):
+        adapter = self._active_adapter()
+        for (entry_adapter, prefix), (ids, cache) in self.entries.items():
+            if entry_adapter != adapter or not prompt.startswith(prefix):
+                continue
+            # Only reuse the cache when the prompt tokenizes to the same ids
+            if self.tokenizer(prompt)["input_ids"][:len(ids)] == ids:
+                return copy.deepcopy(cache)
+        return None
+
+
+def build_stopping_criteria(stop_strings, tokenizer, prompts):
+    if not stop_strings:
+        return None
+    if isinstance(prompts, str):
+        prompts = [prompts]
+    prompt_length = max(len(ids) for ids in tokenizer(prompts)["input_ids"])
+    return StoppingCriteriaList([StopOnStrings(stop_strings, tokenizer, prompt_length)])
+
+
+def truncate_at_stop(text, stop_strings):
+    cut = len(text)
+    for stop in stop_strings or []:
+        index = text.find(stop)
+        if index != -1:
+            cut = min(cut, index)
+    return text[:cut]
+
+
+def iter_until_stop(chunks, stop_strings):
+    # Text is held back until it can no longer be the start of a stop string,
+    # so streamed output matches what truncate_at_stop returns.
+    hold = max((len(s) for s in stop_strings or []), default=1) - 1
+    text = ""
+    emitted = 0
+    for chunk in chunks:
+        text += chunk
+        kept = truncate_at_stop(text, stop_strings)
+        stopped = len(kept) < len(text)
+        end = len(kept) if stopped else max(emitted, len(text) - hold)
+        if end > emitted:
+            yield text[emitted:end]
+            emitted = end
+        if stopped:
+            return
+    if len(text) > emitted:
+        yield text[emitted:]
+
+
+def is_out_of_memory(error):
+    if isinstance(error, MemoryError):
+        return True
+    return "out of memory" in str(error).lower()
+
+
+def release_memory():
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
@@ -1,25 +1,372 @@
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from threading import RLock, Thread, current_thread, main_thread
+
+import torch
+from peft import PeftModel
+from transformers import StoppingCriteriaList, TextIteratorStreamer
+
+from question_prefetcher import QuestionPrefetcher
+from cancellation import CancellationToken, GenerationCancelled, run_cancellable
+from generation_utils import (
+    GenerationTimer,
+    PrefixKVCache,
+    StopOnCancel,
+    build_stopping_criteria,
+    is_out_of_memory,
+    iter_until_stop,
+    release_memory,
+    truncate_at_stop,
+)
+
+
+QUESTION_PROMPT = "As an ML interviewer, ask one challenging machine learning and provide detailed answer. question:"
+ANSWER_PROMPT = "Answer this machine learning question clearly and concisely:\n\nQuestion: {question}\n\nAnswer:"
+REVIEW_PROMPT = """Review this ML interview answer:
+        Question: {question}
+        Candidate Answer: {answer}
+        Rate the Cadidate answer from 0 to 10 and correct it if it's wrong:
+        Review:"""
+
+# Token budgets and stop strings per generation mode. Generation ends at the
+# first stop string, so short outputs no longer pay for the full budget.
+MAX_NEW_TOKENS = {
+    "question": 512,
+    "practice_question": 64,
+    "question_alternative": 256,
+    "answer": 512,
+    "review": 512,
+}
+STOP_STRINGS = {
+    "question": [],
+    "practice_question": ["?"],
+    "question_alternative": ["\nUser:", "\nSystem:"],
+    "answer": ["\nQuestion:"],
+    "review": ["Question:", "Candidate Answer:"],
+}
+# Returned in place of a generation that failed
+QUESTION_ERROR = "Error generating question"
+ANSWER_ERROR = "Error generating answer"
+REVIEW_ERROR = "Error generating review"
+# Modes whose output mostly repeats the prompt, where prompt-lookup decoding
+# drafts well
+PROMPT_LOOKUP_MODES = ("answer", "review")
+
+
+def print_stream(label, chunks):
+    """Prints streamed text as it arrives and returns the full text."""
+    print(f"\n{label}: ", end="", flush=True)
+    parts = []
+    for chunk in chunks:
+        if not parts:
+            chunk = chunk.lstrip()
+        if chunk:
+            parts.append(chunk)
+            print(chunk, end="", flush=True)
+    print()
+    return "".join(parts).strip()
 
 
 class InterviewFunctions:
-    def __init__(self, chat_pipeline):
+    def __init__(self, chat_pipeline, batch_size=8, max_new_tokens=None, stop_strings=None,
+                 response_cache=None, model_identity=None, use_prefix_cache=True, replica_pool=None,
+                 metrics=None, question_bank=None, max_question_attempts=3, prompt_lookup_num_tokens=None,
+                 static_cache=False):
         self.chat_pipeline = chat_pipeline
+        self.batch_size = batch_size
+        self.max_new_tokens = {**MAX_NEW_TOKENS, **(max_new_tokens or {})}
+        self.stop_strings = {**STOP_STRINGS, **(stop_strings or {})}
+        # Optional ResponseCache for answer_question; model_identity (see
+        # ModelLoader.identity) keeps answers from different models apart.
+        self.response_cache = response_cache
+        self.model_identity = model_identity
+        # Optional ReplicaPool that generate_question_batch shards work onto
+        self.replica_pool = replica_pool
+        # Optional GenerationMetrics that every model call is reported to
+        self.metrics = metrics
+        # Optional QuestionBank: near-duplicate questions are regenerated (up
+        # to max_question_attempts) and practice draws unseen stored questions
+        self.question_bank = question_bank
+        self.max_question_attempts = max(1, max_question_attempts)
+        # Prompt-lookup decoding: up to this many draft tokens are copied from
+        # n-gram matches in the prompt and verified in one forward pass. Only
+        # tokens the model itself would produce are kept, so sampling is
+        # unchanged; it needs no draft model but only runs for single prompts.
+        self.prompt_lookup_num_tokens = prompt_lookup_num_tokens
+        # One generation at a time on the shared model; background producers
+        # (see QuestionPrefetcher) and the CLI take turns.
+        self.generation_lock = RLock()
+        # Token of the generation currently holding the lock, for cancel_generation()
+        self.active_token = None
+        # static_cache=True (ModelLoader.static_cache, after compile_generation)
+        # keeps one static KV cache for single sequences; it replaces the
+        # prefix cache there. Batched and prompt-lookup calls use the default
+        # dynamic cache, so the static one is never reallocated.
+        self.static_cache = static_cache
+        self.prefix_cache = self._build_prefix_cache() if use_prefix_cache and not self.static_cache else None
     
-    def generate_question(self, practice=False):
-        prompt = "As an ML interviewer, ask one challenging machine learning and provide detailed answer. question:"
+    def _build_prefix_cache(self):
+        prefix_cache = PrefixKVCache(self.chat_pipeline.model, self.chat_pipeline.tokenizer)
         try:
-            response = self.chat_pipeline(prompt)
-            
-            result = response[0]["generated_text"].strip()
-            if practice:
-                result = result.split("?", 1)[0]
+            prefix_cache.warm([template.split("{", 1)[0] for template in (QUESTION_PROMPT, ANSWER_PROMPT, REVIEW_PROMPT)])
+        except Exception as e:
+            print(f"Warning: prompt prefix caching disabled: {e}")
+            return None
+        return prefix_cache
+    
+    def _answer_cache_key(self, user_question):
+        if self.response_cache is None:
+            return None
+        sampling = {
+            "template": ANSWER_PROMPT,
+            "max_new_tokens": self.max_new_tokens["answer"],
+            "stop": self.stop_strings["answer"],
+            "temperature": 0.7,
+            "top_p": self.chat_pipeline.model.generation_config.top_p,
+        }
+        # model_identity only covers the adapter loaded at start-up, not one
+        # selected later with use_adapter()
+        model_identity = self.model_identity
+        if isinstance(self.chat_pipeline.model, PeftModel):
+            model_identity = {"model": model_identity, "active_adapter": self.chat_pipeline.model.active_adapter}
+        return self.response_cache.make_key(user_question, model_identity, sampling)
+    
+    def _prepare(self, prompts, mode, stop, generate_kwargs):
+        if stop is None:
+            stop = self.stop_strings.get(mode, [])
+        if mode in self.max_new_tokens:
+            generate_kwargs.setdefault("max_new_tokens", self.max_new_tokens[mode])
+        stopping_criteria = build_stopping_criteria(stop, self.chat_pipeline.tokenizer, prompts)
+        if stopping_criteria is not None:
+            generate_kwargs["stopping_criteria"] = stopping_criteria
+        single = isinstance(prompts, str) and generate_kwargs.get("num_return_sequences", 1) == 1
+        if single and self.prompt_lookup_num_tokens and mode in PROMPT_LOOKUP_MODES:
+            generate_kwargs.setdefault("prompt_lookup_num_tokens", self.prompt_lookup_num_tokens)
+        if self.static_cache and single and "prompt_lookup_num_tokens" not in generate_kwargs:
+            generate_kwargs.setdefault("cache_implementation", "static")
+        # Assisted generation manages its own KV cache, so skip the prefix cache
+        if single and self.prefix_cache is not None and "prompt_lookup_num_tokens" not in generate_kwargs \
+                and not self._has_multiple_adapters():
+            past_key_values = self.prefix_cache.lookup(prompts)
+            if past_key_values is not None:
+                generate_kwargs["past_key_values"] = past_key_values
+        return stop, generate_kwargs
+    
+    def _has_multiple_adapters(self):
+        # Adapters can be switched (use_adapter) or mixed per row, so the
+        # prefix cache is skipped rather than risk stale K/V
+        model = self.chat_pipeline.model
+        return isinstance(model, PeftModel) and len(model.peft_config) > 1
+    
+    def _sampling_params(self, generate_kwargs):
+        generation_config = self.chat_pipeline.model.generation_config
+        keys = ("max_new_tokens", "temperature", "top_p", "do_sample", "num_return_sequences", "prompt_lookup_num_tokens")
+        return {key: generate_kwargs.get(key, getattr(generation_config, key, None)) for key in keys}
+    
+    @contextmanager
+    def _locked(self, token):
+        # Polls the lock so a call cancelled while queued behind another
+        # generation gives up right away
+        while not self.generation_lock.acquire(timeout=0.1):
+            if token.cancelled():
+                raise GenerationCancelled()
+        try:
+            yield
+        finally:
+            self.generation_lock.release()
+    
+    def _call_cancellable(self, call, generate_kwargs, token):
+        # On the main thread generate() runs on a worker so Ctrl-C can cancel
+        # the token; it then stops at the next decode step and its partial
+        # output and KV cache are dropped.
+        self.active_token = token
+        try:
+            if token.cancelled():
+                raise GenerationCancelled()
+            if current_thread() is main_thread():
+                result = run_cancellable(lambda: call(generate_kwargs), token)
+            else:
+                result = call(generate_kwargs)
+        finally:
+            self.active_token = None
+            if token.cancelled():
+                generate_kwargs.pop("past_key_values", None)
+                release_memory()
+        if token.cancelled():
+            raise GenerationCancelled()
+        return result
+    
+    def cancel_generation(self):
+        """Stops the in-flight generation, if any, at its next decode step."""
+        token = self.active_token
+        if token is not None:
+            token.cancel()
+    
+    def _run_model(self, mode, prompts, generate_kwargs, call, token=None):
+        # Every model call goes through here. With metrics enabled the call is
+        # timed token by token (prefill = until the first new token) and logged.
+        token = token or CancellationToken()
+        generate_kwargs["stopping_criteria"] = StoppingCriteriaList(
+            [*(generate_kwargs.get("stopping_criteria") or []), StopOnCancel(token)]
+        )
+        if self.metrics is None:
+            with self._locked(token):
+                return self._call_cancellable(call, generate_kwargs, token)
+        
+        model = self.chat_pipeline.model
+        timer = GenerationTimer(generate_kwargs.get("streamer"))
+        generate_kwargs["streamer"] = timer
+        prompt_list = [prompts] if isinstance(prompts, str) else prompts
+        entry = {
+            "mode": mode or "debug",
+            "prompts": len(prompt_list),
+            "prompt_tokens": sum(len(ids) for ids in self.chat_pipeline.tokenizer(prompt_list)["input_ids"]),
+            "sampling": self._sampling_params(generate_kwargs),
+            "model": self.model_identity,
+            "adapter": generate_kwargs.get("adapter_names") or (model.active_adapter if isinstance(model, PeftModel) else None),
+        }
+        
+        def profiled_call(kwargs):
+            # The torch profiler only records the thread that starts it, so it
+            # is entered on the thread that runs generate()
+            with self.metrics.profile(entry["mode"]):
+                return call(kwargs)
+        
+        with self._locked(token):
+            start = time.perf_counter()
+            try:
+                return self._call_cancellable(profiled_call, generate_kwargs, token)
+            except BaseException as e:
+                entry["error"] = repr(e)
+                raise
+            finally:
+                end = time.perf_counter()
+                first = timer.first_token_time
+                entry["generated_tokens"] = timer.tokens
+                entry["total_s"] = end - start
+                entry["prefill_s"] = first - start if first else None
+                entry["decode_s"] = end - first if first else None
+                self.metrics.record(entry)
+    
+    def _generate_texts(self, prompts, mode=None, stop=None, **generate_kwargs):
+        stop, generate_kwargs = self._prepare(prompts, mode, stop, generate_kwargs)
+        response = self._run_model(mode, prompts, generate_kwargs,
+                                   lambda kwargs: self.chat_pipeline(prompts, **kwargs))
+        if isinstance(prompts, str):
+            response = [response]
+        return [truncate_at_stop(r["generated_text"], stop) for outputs in response for r in outputs]
+    
+    def _generate_batch(self, prompts, mode=None, stop=None, adapter_names=None, **generate_kwargs):
+        # Different prompts go straight to model.generate as one left-padded
+        # batch. adapter_names picks a LoRA adapter per row on an unmerged
+        # PeftModel ("__base__" for none), so one batch can mix adapters.
+        stop, generate_kwargs = self._prepare(prompts, mode, stop, generate_kwargs)
+        tokenizer = self.chat_pipeline.tokenizer
+        model = self.chat_pipeline.model
+        if adapter_names is not None:
+            if not hasattr(model, "peft_config"):
+                raise ValueError("Per-request adapters need a model loaded with merge_adapter=False")
+            generate_kwargs["adapter_names"] = list(adapter_names)
+        
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True).to(model.device)
+        
+        def call(kwargs):
+            with torch.no_grad():
+                return model.generate(**inputs, **kwargs)
+        
+        output = self._run_model(mode, prompts, generate_kwargs, call)
+        texts = tokenizer.batch_decode(output[:, inputs["input_ids"].shape[1]:], skip_special_tokens=True)
+        return [truncate_at_stop(text, stop) for text in texts]
+    
+    def _generate_batch_split(self, prompts, mode=None, adapter_names=None, **generate_kwargs):
+        # Splits the batch in half on OOM until it fits
+        try:
+            return self._generate_batch(prompts, mode, adapter_names=adapter_names, **generate_kwargs)
+        except Exception as e:
+            if not is_out_of_memory(e) or len(prompts) == 1:
+                raise
+            release_memory()
+            half = len(prompts) // 2
+            print(f"Out of memory, splitting batch of {len(prompts)}...")
+            return (
+                self._generate_batch_split(prompts[:half], mode, adapter_names and adapter_names[:half], **generate_kwargs)
+                + self._generate_batch_split(prompts[half:], mode, adapter_names and adapter_names[half:], **generate_kwargs)
+            )
+    
+    def _generate(self, prompt, mode=None, stop=None, **generate_kwargs):
+        return self._generate_texts(prompt, mode, stop, **generate_kwargs)[0]
+    
+    def _stream(self, prompt, mode=None, stop=None, **generate_kwargs):
+        # generate() runs on a background thread and pushes decoded text into
+        # the streamer; this generator yields it until a stop string appears.
+        stop, generate_kwargs = self._prepare(prompt, mode, stop, generate_kwargs)
+        streamer = TextIteratorStreamer(self.chat_pipeline.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        token = CancellationToken()
+        errors = []
+        
+        def run():
+            try:
+                self._run_model(mode, prompt, {**generate_kwargs, "streamer": streamer},
+                                lambda kwargs: self.chat_pipeline(prompt, **kwargs), token)
+            except BaseException as e:
+                errors.append(e)
+                streamer.end()
+        
+        thread = Thread(target=run, daemon=True)
+        thread.start()
+        stopped_early = False
+        try:
+            yield from iter_until_stop(streamer, stop)
+            if thread.is_alive() and not token.cancelled():
+                # A stop string ended the stream; the rest is not needed
+                stopped_early = True
+                token.cancel()
+        except BaseException:
+            # Ctrl-C, or the consumer closing the generator early
+            token.cancel()
+            raise
+        finally:
+            thread.join()
+        if errors and not (stopped_early and isinstance(errors[0], GenerationCancelled)):
+            raise errors[0]
+    
+    def _admit_questions(self, questions, practice=False):
+        # True for each question that is new to the bank (and now stored in it)
+        if self.question_bank is None:
+            return [True] * len(questions)
+        ids = self.question_bank.add_many(questions, practice=practice, practiced=practice)
+        return [question_id is not None for question_id in ids]
+    
+    def _admit_question(self, question, practice=False):
+        return self._admit_questions([question], practice)[0]
+    
+    def release_question(self, question):
+        # A practice question that was prepared but never shown stays unseen
+        if self.question_bank is not None:
+            self.question_bank.release(question)
+    
+    def generate_question(self, practice=False, stop=None):
+        mode = "practice_question" if practice else "question"
+        if practice and self.question_bank is not None:
+            stored = self.question_bank.draw_unpracticed()
+            if stored is not None:
+                return stored.split("?", 1)[0]
+        try:
+            for _ in range(self.max_question_attempts):
+                result = self._generate(QUESTION_PROMPT, mode, stop).strip()
+                if practice:
+                    result = result.split("?", 1)[0]
+                if self._admit_question(result, practice):
+                    break
+                print("Near-duplicate question, regenerating...")
             return result
             
         except Exception as e:
             print(f"ERROR in generate_question: {e}")
-            return "Error generating question"
+            return QUESTION_ERROR
     
-    def generate_question_alternative(self, practice=False):
+    def generate_question_alternative(self, practice=False, stop=None):
         system_msg = "You are an experienced ML interviewer."
         if practice:
             user_msg = "Generate a machine learning question for interview practice."
@@ -29,69 +376,185 @@ class InterviewFunctions:
         conversation = f"System: {system_msg}\nUser: {user_msg}\nAssistant:"
         
         try:
-            response = self.chat_pipeline(
-                conversation, 
-                max_new_tokens=256, 
+            result = self._generate(
+                conversation,
+                "question_alternative",
+                stop,
                 temperature=0.8,
                 do_sample=True
             )
-            result = response[0]["generated_text"].strip()
-            return result
+            return result.strip()
             
         except Exception as e:
             print(f"ERROR in generate_question_alternative: {e}")
-            return "Error generating question"
+            return QUESTION_ERROR
     
     def test_basic_generation(self):
         simple_prompt = "What is Machine Learning?"
         
         try:
-            response = self.chat_pipeline(simple_prompt, max_new_tokens=50)
-            result = response[0]["generated_text"]
-            return result
+            return self._generate(simple_prompt, max_new_tokens=50)
         except Exception as e:
             print(f"ERROR in basic generation test: {e}")
             return None
     
     def answer_question(self, user_question):
-        prompt = f"Answer this machine learning question clearly and concisely:\n\nQuestion: {user_question}\n\nAnswer:"
+        cache_key = self._answer_cache_key(user_question)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        prompt = ANSWER_PROMPT.format(question=user_question)
         
         try:
-            response = self.chat_pipeline(prompt, max_new_tokens=512, temperature=0.7)
-            return response[0]["generated_text"].strip()
+            answer = self._generate(prompt, "answer", temperature=0.7).strip()
         except Exception as e:
             print(f"ERROR in answer_question: {e}")
-            return "Error generating answer"
+            return ANSWER_ERROR
+        if cache_key is not None:
+            self.response_cache.put(cache_key, answer)
+        return answer
     
-    def review_answer(self, user_question, user_answer):
-        prompt = f"""Review this ML interview answer:
-        Question: {user_question}
-        Candidate Answer: {user_answer}
-        Rate the Cadidate answer from 0 to 10 and correct it if it's wrong:
-        Review:"""
+    def stream_answer(self, user_question):
+        cache_key = self._answer_cache_key(user_question)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        prompt = ANSWER_PROMPT.format(question=user_question)
         
+        parts = []
         try:
-            response = self.chat_pipeline(prompt, max_new_tokens=512, temperature=0.7)
-            return response[0]["generated_text"].strip()
+            for chunk in self._stream(prompt, "answer", temperature=0.7):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            print(f"ERROR in answer_question: {e}")
+            yield ANSWER_ERROR
+            return
+        if cache_key is not None:
+            self.response_cache.put(cache_key, "".join(parts).strip())
+    
+    def review_answer(self, user_question, user_answer, stop=None):
+        prompt = REVIEW_PROMPT.format(question=user_question, answer=user_answer)
+        
+        try:
+            return self._generate(prompt, "review", stop, temperature=0.7).strip()
+        except Exception as e:
+            print(f"ERROR in review_answer: {e}")
+            return REVIEW_ERROR
+    
+    def stream_review(self, user_question, user_answer, stop=None):
+        prompt = REVIEW_PROMPT.format(question=user_question, answer=user_answer)
+        
+        try:
+            yield from self._stream(prompt, "review", stop, temperature=0.7)
         except Exception as e:
             print(f"ERROR in review_answer: {e}")
-            return "Error generating review"
+            yield REVIEW_ERROR
+    
+    def answer_questions(self, user_questions, adapters=None):
+        # Only questions missing from the response cache are generated; the
+        # cache is skipped for per-request adapters, which it does not key on.
+        answers = [None] * len(user_questions)
+        cache_keys = [None] * len(user_questions)
+        if adapters is None:
+            for i, question in enumerate(user_questions):
+                cache_keys[i] = self._answer_cache_key(question)
+                if cache_keys[i] is not None:
+                    answers[i] = self.response_cache.get(cache_keys[i])
+        pending = [i for i, answer in enumerate(answers) if answer is None]
+        if not pending:
+            return answers
+        
+        prompts = [ANSWER_PROMPT.format(question=user_questions[i]) for i in pending]
+        pending_adapters = [adapters[i] for i in pending] if adapters is not None else None
+        try:
+            results = self._generate_batch_split(prompts, "answer", adapter_names=pending_adapters, temperature=0.7)
+        except Exception as e:
+            print(f"ERROR in answer_questions: {e}")
+            results = None
+        
+        for j, i in enumerate(pending):
+            if results is None:
+                answers[i] = ANSWER_ERROR
+                continue
+            answers[i] = results[j].strip()
+            if cache_keys[i] is not None:
+                self.response_cache.put(cache_keys[i], answers[i])
+        return answers
     
-    def generate_question_batch(self, num_questions=5):
+    def review_answers(self, qa_pairs, adapters=None):
+        prompts = [REVIEW_PROMPT.format(question=q, answer=a) for q, a in qa_pairs]
+        
+        try:
+            results = self._generate_batch_split(prompts, "review", adapter_names=adapters, temperature=0.7)
+            return [r.strip() for r in results]
+        except Exception as e:
+            print(f"ERROR in review_answers: {e}")
+            return [REVIEW_ERROR] * len(prompts)
+    
+    def use_adapter(self, adapter_name):
+        # Selects the adapter used by all single-prompt calls on an unmerged model
+        self.chat_pipeline.model.set_adapter(adapter_name)
+    
+    def generate_question_batch(self, num_questions=5, batch_size=None, practice=False):
+        # All questions share one prompt, so a batch is a single generate call
+        # with num_return_sequences; on OOM the batch is halved and retried.
+        # With a question bank, near-duplicates are dropped and topped up until
+        # the rejections exceed the attempt budget.
+        mode = "practice_question" if practice else "question"
+        batch_size = max(1, batch_size or self.batch_size)
+        max_rejected = num_questions * (self.max_question_attempts - 1)
+        rejected = 0
         questions = []
-        for i in range(num_questions):
-            print(f"Generating question {i+1}/{num_questions}...")
-            question = self.generate_question()
-            questions.append({
-                "id": i + 1,
-                "question": question,
-                "timestamp": datetime.now().isoformat()
-            })
+        while len(questions) < num_questions:
+            start = len(questions)
+            if self.replica_pool is not None:
+                # The pool shards the whole remainder across its workers
+                count = num_questions - start
+            else:
+                count = min(batch_size, num_questions - start)
+            print(f"Generating questions {start + 1}-{start + count}/{num_questions}...")
+            try:
+                if self.replica_pool is not None:
+                    results = [q["question"] for q in self.replica_pool.generate_question_batch(count, batch_size, practice)]
+                else:
+                    response = self._generate_texts(QUESTION_PROMPT, mode, num_return_sequences=count)
+                    results = [r.strip() for r in response]
+                    if practice:
+                        results = [r.split("?", 1)[0] for r in results]
+            except Exception as e:
+                if self.replica_pool is None and is_out_of_memory(e) and count > 1:
+                    release_memory()
+                    batch_size = max(1, count // 2)
+                    print(f"Out of memory, retrying with batch size {batch_size}...")
+                    continue
+                print(f"ERROR in generate_question_batch: {e}")
+                results = [QUESTION_ERROR] * count
+            
+            # One bank transaction per batch
+            admitted = iter(self._admit_questions([r for r in results if r != QUESTION_ERROR], practice))
+            for result in results:
+                if result != QUESTION_ERROR and not next(admitted) and rejected < max_rejected:
+                    rejected += 1
+                    continue
+                questions.append({
+                    "id": len(questions) + 1,
+                    "question": result,
+                    "timestamp": datetime.now().isoformat()
+                })
         return questions
     
     def debug_session(self):
         print("=== Debugging Session ===")
-        
+        try:
+            self._run_debug_tests()
+        except KeyboardInterrupt:
+            print("\n[Debugging cancelled]")
+    
+    def _run_debug_tests(self):
         print("\n1. Testing basic text generation...")
         basic_result = self.test_basic_generation()
         
@@ -112,14 +575,14 @@ class InterviewFunctions:
         for i, test_prompt in enumerate(test_prompts, 1):
             print(f"\n  Test {i}: '{test_prompt}'")
             try:
-                result = self.chat_pipeline(test_prompt, max_new_tokens=100, temperature=0.7)
-                print(f"  Result: '{result[0]['generated_text'][:200]}...'")
+                result = self._generate(test_prompt, max_new_tokens=100, temperature=0.7)
+                print(f"  Result: '{result[:200]}...'")
             except Exception as e:
                 print(f"  Error: {e}")
     
-    def interactive_qa_session(self):
+    def interactive_qa_session(self, journal=None):
         print("=== Interactive Q&A Session ===")
-        print("Type 'quit' to exit, 'debug' for debugging")
+        print("Type 'quit' to exit, 'debug' for debugging, Ctrl-C to stop an answer")
         
         while True:
             user_input = input("\nEnter command or ML question: ")
@@ -129,27 +592,66 @@ class InterviewFunctions:
                 self.debug_session()
                 continue
             
-            print("\nGenerating answer...")
-            answer = self.answer_question(user_input)
-            print(f"\nAnswer: {answer}")
+            try:
+                answer = print_stream("Answer", self.stream_answer(user_input))
+            except KeyboardInterrupt:
+                print("\n[Generation cancelled]")
+                continue
+            if journal is not None:
+                journal.append({"question": user_input, "answer": answer})
     
-    def practice_session(self):
+    def practice_session(self, prefetch=True, journal=None):
         print("=== Practice Session ===")
-        print("Type 'debug' for debugging, 'quit' to exit")
+        print("Type 'debug' for debugging, 'quit' to exit, Ctrl-C to stop a generation")
         
-        while True:
-            choice = input("\nGenerate question? (y/n/debug/quit): ")
-            if choice.lower() in ['n', 'quit']:
-                break
-            elif choice.lower() == 'debug':
-                self.debug_session()
-                continue
-            elif choice.lower() == 'y':
-                print("\nGenerating question...")
-                question = self.generate_question(practice=True)
-                print(f"\nQuestion: {question}")
-                
-                see_answer = input("\nSee model's answer? (y/n): ")
-                if see_answer.lower() == 'y':
-                    answer = self.answer_question(question)
-                    print(f"\nModel's Answer: {answer}")
\ No newline at end of file
+        # Questions and their model answers are prepared in the background
+        # while the user is reading and typing
+        prefetcher = QuestionPrefetcher(self).start() if prefetch else None
+        try:
+            while True:
+                choice = input("\nGenerate question? (y/n/debug/quit): ")
+                if choice.lower() in ['n', 'quit']:
+                    break
+                elif choice.lower() == 'debug':
+                    self.debug_session()
+                    continue
+                elif choice.lower() == 'y':
+                    item = None
+                    if prefetcher is None or not prefetcher.ready():
+                        print("\nGenerating question...")
+                    try:
+                        if prefetcher is not None:
+                            item = prefetcher.get()
+                            question = item.question
+                        else:
+                            question = self.generate_question(practice=True)
+                    except KeyboardInterrupt:
+                        if prefetcher is not None:
+                            # Halts the background generation; the next get() restarts it
+                            prefetcher.stop()
+                        print("\n[Generation cancelled]")
+                        continue
+                    print(f"\nQuestion: {question}")
+                    
+                    model_answer = None
+                    see_answer = input("\nSee model's answer? (y/n): ")
+                    if see_answer.lower() == 'y':
+                        try:
+                            if item is None:
+                                model_answer = print_stream("Model's Answer", self.stream_answer(question))
+                            else:
+                                if not item.answer_ready():
+                                    print("\nGenerating answer...")
+                                model_answer = item.model_answer()
+                                print(f"\nModel's Answer: {model_answer}")
+                        except KeyboardInterrupt:
+                            if item is not None:
+                                # The prefetcher is generating this answer
+                                self.cancel_generation()
+                            print("\n[Generation cancelled]")
+                    if journal is not None:
+                        journal.append({"question": question, "model_answer": model_answer})
+        finally:
+            if prefetcher is not None:
+                print("Stopping background question generation...")
+                prefetcher.stop()
@@ -0,0 +1,406 @@
+"""
+LoRA Trainer
+Fine-tunes a base model with LoRA on the ML interview dataset. Ported from
+LoRA_trainer.ipynb so the notebook and scripts share one implementation.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import time
+import torch
+from datasets import Dataset, load_from_disk
+from datasets.fingerprint import Hasher
+from transformers import (AutoTokenizer, AutoModelForCausalLM, TrainingArguments, Trainer, BitsAndBytesConfig,
+                          EarlyStoppingCallback, DataCollatorForSeq2Seq, TrainerCallback)
+from typing import Dict, Optional
+from peft import LoraConfig, get_peft_model, TaskType
+
+
+PROMPT_TEMPLATE = "### Instruction:\n{}### Response:\n{}"
+
+# Cumulative split fractions: 70% train, 15% validation, 15% test
+SPLITS = (("train", 0.70), ("validation", 0.85), ("test", 1.0))
+
+
+def iter_json_array(data_path: str, key: str = "questions", chunk_size: int = 1 << 20):
+    """Yields the items of the top-level array (or the array under key) without loading the whole file."""
+    decoder = json.JSONDecoder()
+    key_pattern = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+    with open(data_path, encoding="utf-8") as f:
+        buffer = ""
+        pos = None
+        # A top-level array can only open at the real start of the file, never
+        # in a buffer that has been cut down to its tail
+        at_start = True
+        while pos is None:
+            chunk = f.read(chunk_size)
+            buffer += chunk
+            if at_start and buffer.strip():
+                at_start = False
+                if buffer.lstrip().startswith("["):
+                    pos = buffer.index("[") + 1
+                    break
+            match = key_pattern.search(buffer)
+            if match:
+                pos = match.end()
+            elif not chunk:
+                raise ValueError(f"no '{key}' list found")
+            elif not at_start:
+                # Keep enough of the tail to match a key split across chunks
+                buffer = buffer[-(len(key) + 64):]
+
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                if pos == len(buffer):
+                    raise json.JSONDecodeError("buffer exhausted", buffer, pos)
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            yield item
+            if pos > chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+def iter_jsonl(data_path: str):
+    with open(data_path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def assign_split(instruction: str, response: str):
+    # Hash-based, so a row keeps its split when the dataset grows or is reordered
+    digest = hashlib.blake2b(f"{instruction}\0{response}".encode("utf-8"), digest_size=8).digest()
+    bucket = int.from_bytes(digest, "little") / 2 ** 64
+    return next(name for name, upper in SPLITS if bucket < upper)
+
+
+def generate_examples(data_path: str, source_mtime: int = 0, source_size: int = 0):
+    # source_mtime/source_size only feed the dataset fingerprint, so a changed
+    # source file is converted again
+    rows = iter_jsonl(data_path) if data_path.endswith(".jsonl") else iter_json_array(data_path)
+    for idx, q in enumerate(rows, start=1):
+        try:
+            yield {
+                "instruction": f"{q['instruction']}",
+                "input": "",
+                "response": q["response"],
+                "split": assign_split(q["instruction"], q["response"])
+            }
+        except KeyError as e:
+            print(f"Skipping question {idx}: Missing key {e}")
+        except Exception as e:
+            print(f"Skipping question {idx}: due to unexpected error - {e}")
+
+
+class TokensPerSecondCallback(TrainerCallback):
+    """Reports effective (non-padding) training tokens/sec at every log step.
+
+    Tokens are counted from the attention mask of every training forward
+    pass, and only time spent inside training steps is counted.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.hook = None
+        self.tokens = 0
+        self.padded_tokens = 0
+        self.train_time = 0.0
+        self.step_start = None
+        self.last_log = (0, 0, 0.0)
+
+    def _count(self, module, args, kwargs):
+        attention_mask = kwargs.get("attention_mask")
+        if module.training and attention_mask is not None:
+            self.tokens += int(attention_mask.sum())
+            self.padded_tokens += attention_mask.numel()
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self.hook = self.model.register_forward_pre_hook(self._count, with_kwargs=True)
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        self.step_start = time.perf_counter()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if self.step_start is not None:
+            self.train_time += time.perf_counter() - self.step_start
+            self.step_start = None
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        tokens, padded_tokens, train_time = self.last_log
+        new_tokens = self.tokens - tokens
+        if self.train_time > train_time and new_tokens:
+            padding = 1 - new_tokens / (self.padded_tokens - padded_tokens)
+            print(f"Step {state.global_step}: {new_tokens / (self.train_time - train_time):.0f} effective tokens/sec, "
+                  f"{padding:.1%} padding")
+        self.last_log = (self.tokens, self.padded_tokens, self.train_time)
+
+    def on_train_end(self, args, state, control, **kwargs):
+        if self.hook is not None:
+            self.hook.remove()
+            self.hook = None
+        if self.train_time > 0 and self.padded_tokens:
+            print(f"Training: {self.tokens / self.train_time:.0f} effective tokens/sec overall, "
+                  f"{1 - self.tokens / self.padded_tokens:.1%} padding")
+
+
+class LoRATrainer:
+    def __init__(self, data_path: str, model_name: str, max_length: int = 256, pack: bool = True,
+                 cache_dir: str = "./dataset_cache"):
+        self.data_path = data_path
+        self.model_name = model_name
+        # Arrow files of the converted source and of every tokenized split
+        self.cache_dir = cache_dir
+        # Training sequences are packed with whole examples up to max_length
+        # tokens and padded per batch, not to max_length
+        self.max_length = max_length
+        self.pack = pack
+
+        self.lora_config = None
+        self.bnb_config = None
+        self.model = None
+
+        self.tokenizer = None
+        self.train_tokenized_data = None
+        self.validation_tokenized_data = None
+        self.test_tokenized_data = None
+
+        self.train_dataset = None
+        self.validation_dataset = None
+        self.test_dataset = None
+
+        if self.model_name is None or not self.model_name.strip():
+            raise ValueError("Model name cannot be none or empty")
+
+    def set_lora_conf(self, lora_config: Optional[Dict] = None):
+        if lora_config is None or not lora_config:
+            lora_config = {
+                "r":8,
+                "lora_alpha":16,
+                "target_modules":['q_proj', 'v_proj'],
+                "lora_dropout":0.05,
+                "bias":"none",
+                "task_type": TaskType.CAUSAL_LM
+            }
+
+        self.lora_config = LoraConfig(**lora_config)
+        return self.lora_config
+
+    def set_bnb_config(self, bnb_config: Optional[Dict] = None):
+        if not bnb_config or bnb_config is None:
+            bnb_config = {
+                "load_in_4bit":True,
+                "bnb_4bit_quant_type":'nf4',
+                "bnb_4bit_compute_dtype":torch.bfloat16
+            }
+
+        self.bnb_config = BitsAndBytesConfig(**bnb_config)
+        return self.bnb_config
+
+    def load_model(self):
+        self.model = AutoModelForCausalLM.from_pretrained(
+            self.model_name,
+            quantization_config = self.bnb_config,
+            device_map = "auto",
+            trust_remote_code = True
+        )
+        self.model = get_peft_model(self.model, self.lora_config)
+        return self.model
+
+    def load_tokenizer(self):
+        if self.tokenizer is None:
+            self.tokenizer = AutoTokenizer.from_pretrained(
+                self.model_name,
+                trust_remote_code=True)
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+        return self.tokenizer
+
+    def preprocess_data(self, batch: Dict):
+        # No padding here; each example ends with EOS so packed examples stay
+        # separated and the model learns where a response ends
+        tokenizer = self.load_tokenizer()
+        texts = [PROMPT_TEMPLATE.format(inst, resp) + tokenizer.eos_token
+                 for inst, resp in zip(batch["instruction"], batch["response"])]
+
+        tokens = tokenizer(
+            texts,
+            max_length=self.max_length,
+            truncation=True,
+            add_special_tokens=False
+        )
+
+        tokens['labels'] = [list(ids) for ids in tokens['input_ids']]
+        return tokens
+
+    def pack_sequences(self, batch: Dict):
+        # Greedily fills sequences of up to max_length tokens with whole
+        # examples in order, so no example is split across two sequences
+        packed = {"input_ids": [], "attention_mask": [], "labels": []}
+        current = {"input_ids": [], "attention_mask": [], "labels": []}
+        for ids, mask, labels in zip(batch["input_ids"], batch["attention_mask"], batch["labels"]):
+            if current["input_ids"] and len(current["input_ids"]) + len(ids) > self.max_length:
+                for key in packed:
+                    packed[key].append(current[key])
+                current = {"input_ids": [], "attention_mask": [], "labels": []}
+            current["input_ids"] += ids
+            current["attention_mask"] += mask
+            current["labels"] += labels
+        if current["input_ids"]:
+            for key in packed:
+                packed[key].append(current[key])
+        return packed
+
+    def _tokenize(self, dataset, data_type: str):
+        # Tokenized splits are saved under a key of the split contents, the
+        # tokenizer, the template and the packing settings; re-runs load them
+        key = Hasher.hash([dataset._fingerprint, self.load_tokenizer(), PROMPT_TEMPLATE, self.max_length, self.pack])
+        cache_path = os.path.join(self.cache_dir, "tokenized", key, data_type)
+        if os.path.isdir(cache_path):
+            print(f"Loading tokenized {data_type} data from cache: {cache_path}")
+            return load_from_disk(cache_path)
+
+        tokenized = dataset.map(self.preprocess_data, batched=True, remove_columns=dataset.column_names)
+        if self.pack:
+            tokenized = tokenized.map(self.pack_sequences, batched=True, batch_size=1000,
+                                      remove_columns=tokenized.column_names)
+        tokenized.save_to_disk(cache_path)
+        return load_from_disk(cache_path)
+
+    def set_tokenized_data(self, data_type: str = 'train'):
+        if data_type == "train":
+            self.train_tokenized_data = self._tokenize(self.train_dataset, data_type)
+            return self.train_tokenized_data
+        elif data_type == "validation":
+            self.validation_tokenized_data = self._tokenize(self.validation_dataset, data_type)
+            return self.validation_tokenized_data
+        elif data_type == "test":
+            self.test_tokenized_data = self._tokenize(self.test_dataset, data_type)
+            return self.test_tokenized_data
+
+    def train(self, training_args: Optional[Dict]=None, adapted_model_path: str='./tinyllama-lora-ftuned-adapted'):
+        if not training_args or training_args is None:
+            training_args = {
+                "output_dir":'./tinyllama-lora-ftuned-ml',
+                'per_device_train_batch_size':4,
+                'gradient_accumulation_steps':4,
+                'learning_rate':1e-3,
+                'num_train_epochs':50,
+                'fp16':True,
+                'report_to':'none',
+                'logging_steps':20,
+                'save_strategy':'epoch',
+                'eval_strategy': 'epoch',
+                'save_total_limit': 3,
+                'load_best_model_at_end': True,
+                'metric_for_best_model': 'eval_loss',
+                'greater_is_better': False,
+                'remove_unused_columns': False,
+                'label_names': ['labels'],
+                'group_by_length': True
+            }
+
+        self.training_args = TrainingArguments(**training_args)
+
+        early_stopping = EarlyStoppingCallback(
+            early_stopping_patience=3,
+            early_stopping_threshold=0.01
+        )
+
+        # Pads each batch to its longest sequence; padded label positions are
+        # ignored by the loss
+        data_collator = DataCollatorForSeq2Seq(
+            self.load_tokenizer(),
+            padding=True,
+            pad_to_multiple_of=8,
+            label_pad_token_id=-100
+        )
+
+        trainer = Trainer(
+            model = self.model,
+            args = self.training_args,
+            train_dataset = self.train_tokenized_data,
+            eval_dataset = self.validation_tokenized_data,
+            processing_class = self.tokenizer,
+            data_collator = data_collator,
+            callbacks=[early_stopping, TokensPerSecondCallback(self.model)]
+        )
+
+        self.trainer = trainer
+
+        print("Training the model")
+        trainer.train()
+
+        print("Saving the new weights")
+        self.model.save_pretrained(adapted_model_path)
+        self.tokenizer.save_pretrained(adapted_model_path)
+
+    def evaluate_on_test(self):
+        if not hasattr(self, "trainer"):
+            raise RuntimeError("Trainer not found. Train the model before evaluation.")
+
+        if self.test_tokenized_data is None:
+            self.set_tokenized_data("test")
+
+        print("Evaluating on test dataset...")
+        results = self.trainer.evaluate(self.test_tokenized_data)
+
+        # Perplexity is a common metric for language models
+        try:
+            results["perplexity"] = math.exp(results["eval_loss"])
+        except OverflowError:
+            results["perplexity"] = float("inf")
+
+        print("Test Results:", results)
+        return results
+
+
+    def prepare_and_load_data(self):
+            # The source (a {"questions": [...]} JSON file or JSONL) is parsed
+            # incrementally and written straight to a memory-mapped Arrow
+            # dataset, which is reused until the source file changes
+            try:
+                stat = os.stat(self.data_path)
+            except FileNotFoundError:
+                print(f"Error: File not found -> {self.data_path}")
+                return []
+
+            try:
+                dataset = Dataset.from_generator(
+                    generate_examples,
+                    gen_kwargs={"data_path": self.data_path, "source_mtime": stat.st_mtime_ns, "source_size": stat.st_size},
+                    cache_dir=self.cache_dir
+                )
+            except Exception as e:
+                # Parse errors surface wrapped in a DatasetGenerationError
+                print(f"Error: could not load {self.data_path} - {e.__cause__ or e}")
+                return []
+
+            splits = {
+                name: dataset.filter(lambda split, name=name: split == name, input_columns="split").remove_columns("split")
+                for name, _ in SPLITS
+            }
+            self.train_dataset = splits["train"]            # 70%
+            self.validation_dataset = splits["validation"]  # 15%
+            self.test_dataset = splits["test"]              # 15%
+
+            print(f"Train samples: {len(self.train_dataset)}")
+            print(f"Validation samples: {len(self.validation_dataset)}")
+            print(f"Test samples: {len(self.test_dataset)}")
+
+            return self.train_dataset, self.validation_dataset, self.test_dataset
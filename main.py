@@ -3,29 +3,148 @@ ML Interview Assistant - Main Application
 A modular system for ML interview question generation, answering, and review.
 """
 
-from model_loader import ModelLoader
-from interview_functions import InterviewFunctions
+import argparse
+import threading
+
+# model_loader, interview_functions and replica_pool pull in torch,
+# transformers and peft; they are imported on the loading thread so the
+# menu appears immediately.
 from file_utils import FileUtils
-from datetime import datetime
+from metrics import GenerationMetrics
+from question_bank import QuestionBank
+from question_prefetcher import QuestionPrefetcher
+from response_cache import ResponseCache
+
+
+DEFAULT_BASE_MODEL = "Qwen/Qwen2.5-0.5B-Instruct"
 
 
 class MLInterviewAssistant:
-    def __init__(self):
+    def __init__(self, loader_options=None, response_cache=None, num_workers=0, metrics=None, question_bank=None,
+                 prompt_lookup_num_tokens=None):
+        self.loader_options = loader_options or {}
+        self.response_cache = response_cache
+        self.metrics = metrics
+        self.question_bank = question_bank
+        self.prompt_lookup_num_tokens = prompt_lookup_num_tokens
+        self.num_workers = num_workers
+        self.replica_pool = None
         self.model_loader = None
         self.interview_functions = None
-        self.file_utils = FileUtils()
-        self.qa_session_data = []
-        self.practice_session_data = []
+        self.file_utils = FileUtils(question_bank=question_bank)
+        # Session entries stream to append-only journals (see SessionJournal),
+        # opened on the first entry of each kind
+        self.journals = {}
+        self.review_prefetcher = None
+        
+        # Background model loading state
+        self.base_model_name = self.loader_options.get("base_model_name", DEFAULT_BASE_MODEL)
+        self.load_status = "Not started"
+        self.load_error = None
+        self.model_ready = threading.Event()
+        self.model_ready.set()
     
-    def initialize_model(self, base_model_name=None):
-        print("Initializing ML Interview Assistant...")
+    def set_load_status(self, message):
+        self.load_status = message
+    
+    def start_model_loading(self, base_model_name=None):
+        """Loads (or switches) the model on a background thread"""
         if base_model_name:
-            self.model_loader = ModelLoader(base_model_name=base_model_name)
+            self.base_model_name = base_model_name
+        self.load_error = None
+        self.model_ready.clear()
+        self.set_load_status("Starting...")
+        threading.Thread(target=self._load_model_in_background, daemon=True).start()
+    
+    def _load_model_in_background(self):
+        try:
+            self.initialize_model(self.base_model_name)
+        except Exception as e:
+            self.load_error = e
+            self.set_load_status(f"Failed: {e}")
+        finally:
+            self.model_ready.set()
+    
+    def wait_for_model(self):
+        """Blocks until the model is loaded; returns False if loading failed"""
+        if not self.model_ready.is_set():
+            print("\nWaiting for the model to finish loading...")
+            last_status = None
+            try:
+                while not self.model_ready.wait(0.5):
+                    if self.load_status != last_status:
+                        last_status = self.load_status
+                        print(f"  {last_status}")
+            except KeyboardInterrupt:
+                # Loading carries on in the background
+                print("\n[Stopped waiting]")
+                return False
+        if self.load_error is not None or self.interview_functions is None:
+            print(f"Error initializing model: {self.load_error}")
+            print("Make sure the model files are in the correct location.")
+            return False
+        return True
+    
+    def journal(self, kind):
+        if kind not in self.journals:
+            self.journals[kind] = self.file_utils.open_journal(kind)
+        return self.journals[kind]
+    
+    def save_session(self, kind, empty_message):
+        journal = self.journals.get(kind)
+        if journal is None or not len(journal):
+            print(empty_message)
+            return
+        md_file = self.file_utils.save_journal_to_md(journal, kind)
+        pdf_choice = input("Also save as PDF? (y/n): ")
+        if pdf_choice.lower() == 'y':
+            self.file_utils.save_to_pdf(md_file, background=True)
+    
+    def close_journals(self):
+        for journal in self.journals.values():
+            journal.close()
+    
+    def print_stream(self, label, chunks):
+        from interview_functions import print_stream
+        return print_stream(label, chunks)
+    
+    def initialize_model(self, base_model_name=None):
+        self.set_load_status("Importing model libraries...")
+        from model_loader import ModelLoader
+        from interview_functions import InterviewFunctions
+        
+        self.set_load_status("Initializing ML Interview Assistant...")
+        if self.model_loader is None:
+            options = dict(self.loader_options)
+            if base_model_name:
+                options["base_model_name"] = base_model_name
+            options["progress_callback"] = self.set_load_status
+            self.model_loader = ModelLoader(**options)
+            chat_pipeline = self.model_loader.load_model()
         else:
-            self.model_loader = ModelLoader()    
-        chat_pipeline = self.model_loader.load_model()
-        self.interview_functions = InterviewFunctions(chat_pipeline)
-        print("Initialization complete!")
+            # Drop the old pipeline reference so an evicted model can be freed
+            self.interview_functions = None
+            chat_pipeline = self.model_loader.switch_model(base_model_name or self.model_loader.base_model_name)
+        if self.num_workers:
+            # Batch question generation is sharded over worker replicas
+            from replica_pool import ReplicaPool
+            self.set_load_status("Starting worker replicas...")
+            if self.replica_pool is not None:
+                self.replica_pool.close()
+            options = {**self.loader_options, "base_model_name": self.model_loader.base_model_name}
+            self.replica_pool = ReplicaPool(self.num_workers, loader_options=options)
+        self.interview_functions = InterviewFunctions(
+            chat_pipeline,
+            response_cache=self.response_cache,
+            model_identity=self.model_loader.identity(),
+            replica_pool=self.replica_pool,
+            metrics=self.metrics,
+            question_bank=self.question_bank,
+            prompt_lookup_num_tokens=self.prompt_lookup_num_tokens,
+            static_cache=self.model_loader.static_cache
+        )
+        self.base_model_name = self.model_loader.base_model_name
+        self.set_load_status("Ready")
     
     def question_generation_mode(self):
         """Mode for generating and saving questions"""
@@ -41,14 +160,24 @@ class MLInterviewAssistant:
             choice = input("\nEnter your choice (1-5): ")
             
             if choice == "1":
-                question = self.interview_functions.generate_question()
+                if not self.wait_for_model():
+                    continue
+                try:
+                    question = self.interview_functions.generate_question()
+                except KeyboardInterrupt:
+                    print("\n[Generation cancelled]")
+                    continue
                 print(f"\nGenerated Question:\n{question}")
                 
+                # Only saved questions go into the session journal
                 save_choice = input("\nSave this question? (y/n): ")
                 if save_choice.lower() == 'y':
-                    self.file_utils.save_questions_to_md([{"question": question}])
+                    self.journal("questions").append({"question": question})
+                    self.file_utils.save_journal_to_md(self.journal("questions"), "questions")
             
             elif choice == "2":
+                if not self.wait_for_model():
+                    continue
                 try:
                     num_questions = int(input("How many questions? (default 5): ") or "5")
                     questions = self.interview_functions.generate_question_batch(num_questions)
@@ -59,22 +188,17 @@ class MLInterviewAssistant:
                     
                     save_choice = input("\nSave these questions? (y/n): ")
                     if save_choice.lower() == 'y':
-                        md_file = self.file_utils.save_questions_to_md(questions)
-                        pdf_choice = input("Also save as PDF? (y/n): ")
-                        if pdf_choice.lower() == 'y':
-                            self.file_utils.save_to_pdf(md_file)
+                        for q in questions:
+                            self.journal("questions").append({"question": q['question']})
+                        self.save_session("questions", "No questions to save. Generate some questions first.")
                 
                 except ValueError:
                     print("Please enter a valid number.")
+                except KeyboardInterrupt:
+                    print("\n[Generation cancelled]")
             
             elif choice == "3":
-                if not self.qa_session_data:
-                    print("No questions to save. Generate some questions first.")
-                else:
-                    md_file = self.file_utils.save_questions_to_md(self.qa_session_data)
-                    pdf_choice = input("Also save as PDF? (y/n): ")
-                    if pdf_choice.lower() == 'y':
-                        self.file_utils.save_to_pdf(md_file)
+                self.save_session("questions", "No questions to save. Generate some questions first.")
             
             elif choice == "5":
                 break
@@ -97,52 +221,71 @@ class MLInterviewAssistant:
             choice = input("\nEnter your choice (1-5): ")
             
             if choice == "1":
+                if not self.wait_for_model():
+                    continue
                 question = input("Enter your ML question: ")
-                print("\nGenerating answer...")
-                answer = self.interview_functions.answer_question(question)
-                print(f"\nAnswer: {answer}")
+                try:
+                    answer = self.print_stream("Answer", self.interview_functions.stream_answer(question))
+                except KeyboardInterrupt:
+                    print("\n[Generation cancelled]")
+                    continue
                 
-                # Save to session data
-                self.qa_session_data.append({
+                # Save to session journal
+                self.journal("qa").append({
                     "question": question,
-                    "answer": answer,
-                    "timestamp": datetime.now().isoformat()
+                    "answer": answer
                 })
             
             elif choice == "2":
-                question = self.interview_functions.generate_question(practice=True)
+                if not self.wait_for_model():
+                    continue
+                # Started on the first review so the next questions are ready instantly
+                if self.review_prefetcher is None:
+                    self.review_prefetcher = QuestionPrefetcher(self.interview_functions, with_answers=False).start()
+                if not self.review_prefetcher.ready():
+                    print("\nGenerating question...")
+                try:
+                    question = self.review_prefetcher.get().question
+                except KeyboardInterrupt:
+                    # Halts the background generation too
+                    self.stop_review_prefetcher()
+                    print("\n[Generation cancelled]")
+                    continue
                 print(f"{question}")
                 user_answer = input("Enter your answer: ")
-                print("\nGenerating review...")
-                review = self.interview_functions.review_answer(question, user_answer)
-                print(f"\nReview: {review}")
+                try:
+                    review = self.print_stream("Review", self.interview_functions.stream_review(question, user_answer))
+                except KeyboardInterrupt:
+                    print("\n[Generation cancelled]")
+                    continue
                 
-                # Save to session data
-                self.qa_session_data.append({
+                # Save to session journal
+                self.journal("qa").append({
                     "question": question,
                     "answer": user_answer,
-                    "review": review,
-                    "timestamp": datetime.now().isoformat()
+                    "review": review
                 })
             
             elif choice == "3":
-                self.interview_functions.interactive_qa_session()
+                if not self.wait_for_model():
+                    continue
+                self.interview_functions.interactive_qa_session(journal=self.journal("qa"))
             
             elif choice == "4":
-                if not self.qa_session_data:
-                    print("No Q&A session data to save.")
-                else:
-                    md_file = self.file_utils.save_qa_session_to_md(self.qa_session_data)
-                    pdf_choice = input("Also save as PDF? (y/n): ")
-                    if pdf_choice.lower() == 'y':
-                        self.file_utils.save_to_pdf(md_file)
+                self.save_session("qa", "No Q&A session data to save.")
             
             elif choice == "5":
+                self.stop_review_prefetcher()
                 break
             
             else:
                 print("Invalid choice. Please try again.")
     
+    def stop_review_prefetcher(self):
+        if self.review_prefetcher is not None:
+            self.review_prefetcher.stop()
+            self.review_prefetcher = None
+    
     def practice_mode(self):
         """Mode for practice sessions with generated questions"""
         print("\n=== Practice Mode ===")
@@ -156,16 +299,12 @@ class MLInterviewAssistant:
             choice = input("\nEnter your choice (1-3): ")
             
             if choice == "1":
-                self.interview_functions.practice_session()
+                if not self.wait_for_model():
+                    continue
+                self.interview_functions.practice_session(journal=self.journal("practice"))
             
             elif choice == "2":
-                if not self.practice_session_data:
-                    print("No practice session data to save.")
-                else:
-                    md_file = self.file_utils.save_practice_session(self.practice_session_data)
-                    pdf_choice = input("Also save as PDF? (y/n): ")
-                    if pdf_choice.lower() == 'y':
-                        self.file_utils.save_to_pdf(md_file)
+                self.save_session("practice", "No practice session data to save.")
             
             elif choice == "3":
                 break
@@ -176,19 +315,14 @@ class MLInterviewAssistant:
     def run(self):
         """Main application loop"""
         print("Welcome to ML Interview Assistant!")
-        print("Loading model...")
-        
-        try:
-            self.initialize_model()
-        except Exception as e:
-            print(f"Error initializing model: {e}")
-            print("Make sure the model files are in the correct location.")
-            return
+        print("Loading model in the background...")
+        self.start_model_loading()
         
         while True:
             print("\n" + "="*50)
             print("ML INTERVIEW ASSISTANT")
-            print("Default Base Model is : ", self.model_loader.base_model_name)
+            print("Default Base Model is : ", self.base_model_name)
+            print("Model status: ", self.load_status)
 
             print("="*50)
             print("0. Change Base Model")
@@ -210,13 +344,11 @@ class MLInterviewAssistant:
                 elif model_choice == "2":
                     base_model = "Qwen/Qwen2.5-0.5B-Instruct"
                 else:
-                    print("Invalid choice. Choosing default model: ", self.model_loader.base_model_name)    
-                try:
-                    self.initialize_model(base_model_name = base_model)
-                except Exception as e:
-                    print(f"Error initializing model: {e}")
-                    print("Make sure the model files are in the correct location.")
-                    return
+                    print("Invalid choice. Choosing default model: ", self.base_model_name)
+                    base_model = self.base_model_name
+                # Let a load in progress finish before switching
+                self.model_ready.wait()
+                self.start_model_loading(base_model_name = base_model)
                 
             elif choice == "1":
                 self.question_generation_mode()
@@ -225,15 +357,78 @@ class MLInterviewAssistant:
             elif choice == "3":
                 self.practice_mode()
             elif choice == "4":
+                if self.response_cache is not None:
+                    stats = self.response_cache.stats()
+                    print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+                    self.response_cache.close()
+                if self.question_bank is not None:
+                    stats = self.question_bank.stats()
+                    print(f"Question bank: {stats['questions']} questions, {stats['unpracticed']} not yet practiced")
+                    self.question_bank.close()
+                if self.replica_pool is not None:
+                    self.replica_pool.close()
+                self.close_journals()
+                self.file_utils.close()
                 print("Thank you for using ML Interview Assistant!")
                 break
             else:
                 print("Invalid choice. Please try again.")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="ML Interview Assistant")
+    parser.add_argument("--profile", choices=["default", "cpu"], default="default",
+                        help="Inference profile; 'cpu' runs float32/bfloat16 on the CPU")
+    parser.add_argument("--quantize", action="store_true",
+                        help="Apply int8 dynamic quantization to Linear layers (cpu profile)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Number of intra-op CPU threads (cpu profile)")
+    parser.add_argument("--compile", action="store_true",
+                        help="Compile generation with a static KV cache (slower startup, faster tokens)")
+    parser.add_argument("--max-prompt-tokens", type=int, default=512,
+                        help="Prompt tokens the static KV cache is sized for, on top of max_new_tokens")
+    parser.add_argument("--response-cache", nargs="?", const="./output/response_cache.sqlite3", default=None,
+                        metavar="PATH", help="Cache generated answers on disk (default path: %(const)s)")
+    parser.add_argument("--cache-size-mb", type=float, default=64,
+                        help="Maximum response cache size before LRU eviction")
+    parser.add_argument("--cache-ttl-hours", type=float, default=168,
+                        help="Time-to-live of cached answers")
+    parser.add_argument("--question-bank", nargs="?", const="./output/question_bank.sqlite3", default=None,
+                        metavar="PATH", help="Keep generated questions on disk and reject near-duplicates "
+                                             "(default path: %(const)s)")
+    parser.add_argument("--dedup-threshold", type=float, default=0.6,
+                        help="Estimated Jaccard similarity at which two questions count as duplicates")
+    parser.add_argument("--prompt-lookup", type=int, nargs="?", const=10, default=None, metavar="N",
+                        help="Draft up to N tokens from the prompt when answering and reviewing (default N: %(const)s)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Worker processes for batch question generation (0 = in-process)")
+    parser.add_argument("--metrics-log", default=None, metavar="PATH",
+                        help="Append one JSON line per model call (tokens, prefill/decode time, errors)")
+    parser.add_argument("--prometheus", default=None, metavar="PATH",
+                        help="Keep a Prometheus text snapshot of generation metrics at PATH")
+    parser.add_argument("--torch-profile", nargs="+", default=None, metavar="MODE",
+                        help="Capture torch profiler traces for these modes (e.g. answer review)")
+    return parser.parse_args()
+
+
 def main():
     """Main entry point"""
-    assistant = MLInterviewAssistant()
+    args = parse_args()
+    loader_options = {"profile": args.profile, "quantize": args.quantize, "num_threads": args.threads,
+                      "compile_generation": args.compile, "max_prompt_tokens": args.max_prompt_tokens}
+    response_cache = None
+    if args.response_cache:
+        response_cache = ResponseCache(args.response_cache, max_size_mb=args.cache_size_mb,
+                                       ttl_seconds=args.cache_ttl_hours * 3600)
+    metrics = None
+    if args.metrics_log or args.prometheus or args.torch_profile:
+        metrics = GenerationMetrics(log_path=args.metrics_log, prometheus_path=args.prometheus,
+                                    profile_modes=args.torch_profile)
+    question_bank = None
+    if args.question_bank:
+        question_bank = QuestionBank(args.question_bank, threshold=args.dedup_threshold)
+    assistant = MLInterviewAssistant(loader_options, response_cache, args.workers, metrics, question_bank,
+                                     args.prompt_lookup)
     assistant.run()
 
 
@@ -0,0 +1,126 @@
+import contextlib
+import json
+import os
+import statistics
+import sys
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+
+def reset_peak_rss():
+    # Writing 5 to clear_refs resets VmHWM on Linux; elsewhere the peak is
+    # process-wide and only ever grows
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentiles(values):
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "p50": pick(0.5),
+        "p90": pick(0.9),
+        "p99": pick(0.99),
+        "mean": statistics.fmean(ordered),
+    }
+
+
+class GenerationMetrics:
+    """Records one structured entry per model call.
+
+    Entries are appended to a JSONL log and aggregated into counters that are
+    exported as a Prometheus text snapshot. Calls in profile_modes are also
+    captured with the torch profiler as Chrome traces.
+    """
+
+    def __init__(self, log_path="./output/generation_metrics.jsonl", prometheus_path=None,
+                 profile_modes=None, profile_dir="./output/profiles"):
+        self.log_path = log_path
+        self.prometheus_path = prometheus_path
+        self.profile_modes = set(profile_modes or [])
+        self.profile_dir = profile_dir
+        self.lock = threading.Lock()
+        self.totals = defaultdict(float)
+
+        if log_path:
+            os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+
+    def record(self, entry):
+        entry = {"time": datetime.now().isoformat(), **entry}
+        status = "error" if entry.get("error") else "ok"
+        labels = (entry["mode"], status)
+        with self.lock:
+            self.totals[("calls", labels)] += 1
+            self.totals[("prompt_tokens", labels)] += entry.get("prompt_tokens", 0)
+            self.totals[("generated_tokens", labels)] += entry.get("generated_tokens", 0)
+            self.totals[("prefill_seconds", labels)] += entry.get("prefill_s") or 0.0
+            self.totals[("decode_seconds", labels)] += entry.get("decode_s") or 0.0
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        if self.prometheus_path:
+            self.write_prometheus()
+
+    def prometheus_text(self):
+        descriptions = {
+            "calls": "Model generation calls",
+            "prompt_tokens": "Prompt tokens processed",
+            "generated_tokens": "Tokens generated",
+            "prefill_seconds": "Time spent before the first generated token",
+            "decode_seconds": "Time spent generating after the first token",
+        }
+        lines = []
+        with self.lock:
+            totals = dict(self.totals)
+        for metric, description in descriptions.items():
+            name = f"loraview_generation_{metric}_total"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            for (key, (mode, status)), value in sorted(totals.items()):
+                if key == metric:
+                    lines.append(f'{name}{{mode="{mode}",status="{status}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        path = path or self.prometheus_path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+        return path
+
+    @contextlib.contextmanager
+    def profile(self, mode):
+        if mode not in self.profile_modes:
+            yield
+            return
+        import torch
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with torch.profiler.profile(record_shapes=True) as profiler:
+            yield
+        trace_path = os.path.join(self.profile_dir, f"{mode}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json")
+        profiler.export_chrome_trace(trace_path)
+        print(f"Profiler trace saved to: {trace_path}")
@@ -1,62 +1,359 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+import functools
+import hashlib
+import os
+import shutil
+from collections import OrderedDict
+
+import torch
+from accelerate import init_empty_weights
+from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer, StaticCache, pipeline
 from peft import PeftModel
 
+from generation_utils import release_memory
+
+
+ADAPTER_PATHS = {
+    "Qwen/Qwen2.5-0.5B-Instruct": "./qwen-lora-ftuned-adapted/",
+    "TinyLlama/TinyLlama-1.1B-Chat-v1.0": "./tinyllama-lora-ftuned-adapted-v2/",
+}
+ADAPTER_FILES = ["adapter_config.json", "adapter_model.safetensors", "adapter_model.bin"]
+
+
+def cpu_supports_bf16():
+    # bfloat16 matmuls are only fast on CPUs with native bf16 instructions
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
 
 
 class ModelLoader:
-    def __init__(self, base_model_name="Qwen/Qwen2.5-0.5B-Instruct", adapter_path="./qwen-lora-ftuned-adapted/"):
+    def __init__(self, base_model_name="Qwen/Qwen2.5-0.5B-Instruct", adapter_path="./qwen-lora-ftuned-adapted/",
+                 cache_dir="./model_cache", use_cache=True, max_resident_gb=4.0, merge_adapter=True,
+                 profile="default", torch_dtype=None, quantize=False, num_threads=None, progress_callback=None,
+                 compile_generation=False, max_prompt_tokens=512):
         self.base_model_name = base_model_name
-        self.adapter_path = adapter_path
+        self.adapter_path = self._resolve_adapter_path(base_model_name, adapter_path)
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        # With merge_adapter=False the base model stays wrapped in PeftModel so
+        # several named adapters can share it (see add_adapter).
+        self.merge_adapter = merge_adapter
+
+        # profile="cpu" keeps everything on the CPU in float32 (or bfloat16
+        # where the CPU supports it), optionally with int8 dynamic
+        # quantization of the Linear layers after merging.
+        self.profile = profile
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self.device_map = "cpu" if profile == "cpu" else "auto"
+        self.torch_dtype = torch_dtype or self._default_dtype()
+        self.runtime_config = {}
+        # compile_generation=True pre-allocates a static KV cache of
+        # max_prompt_tokens + max_new_tokens and compiles the forward pass
+        # once at load, with a warm-up so the compile cost is paid there.
+        self.compile_generation = compile_generation
+        self.max_prompt_tokens = max_prompt_tokens
+        # Loading messages go to progress_callback instead of stdout when set,
+        # e.g. when the model loads on a background thread
+        self.progress_callback = progress_callback
         self.model = None
         self.tokenizer = None
         self.chat_pipeline = None
+        # True once compile_generation succeeded; single-sequence calls should
+        # then pass cache_implementation="static" (see InterviewFunctions)
+        self.static_cache = False
+
+        # Loaded models stay resident, least recently used first, until their
+        # combined size exceeds max_resident_gb.
+        self.max_resident_bytes = int(max_resident_gb * 1024 ** 3)
+        self.resident_models = OrderedDict()
+
+    def _report(self, message):
+        if self.progress_callback is not None:
+            self.progress_callback(message)
+        else:
+            print(message)
+
+    def _default_dtype(self):
+        if self.profile != "cpu":
+            return "float16"
+        # quantize_dynamic only converts float32 Linear layers
+        if not self.quantize and cpu_supports_bf16():
+            return "bfloat16"
+        return "float32"
+
+    def _apply_cpu_profile(self):
+        threads = self.num_threads or os.cpu_count()
+        torch.set_num_threads(threads)
+        if self.quantize and not self.merge_adapter:
+            self._report("Warning: int8 quantization needs a merged adapter, skipping it")
+        elif self.quantize:
+            self._report("Applying int8 dynamic quantization...")
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+            )
+
+    def _compile_generation(self, max_new_tokens):
+        if not self.merge_adapter:
+            self._report("Warning: compiled generation needs a merged adapter, skipping it")
+            return False
+        eager_forward = self.model.forward
+        compiled_forward = torch.compile(eager_forward)
+
+        @functools.wraps(eager_forward)
+        def forward(*args, **kwargs):
+            # Only static-cache calls, the ones the warm-up compiles for, use
+            # the compiled graph; a dynamic cache would fail its guards and
+            # recompile on the first batched or prompt-lookup call
+            if isinstance(kwargs.get("past_key_values"), StaticCache):
+                return compiled_forward(*args, **kwargs)
+            return eager_forward(*args, **kwargs)
+
+        self.model.forward = forward
+        try:
+            self._report("Compiling generation (warm-up)...")
+            # generate() keeps its static cache between calls while it is large
+            # enough, so the first call sizes it to the full budget. The second
+            # call, with another prompt length, makes the compiled prefill
+            # shape-dynamic before any real prompt arrives.
+            token_id = self.tokenizer.encode("warm", add_special_tokens=False)[0]
+            for prompt_tokens in (self.max_prompt_tokens + max_new_tokens - 2, 16):
+                input_ids = torch.full((1, prompt_tokens), token_id, device=self.model.device)
+                with torch.no_grad():
+                    self.model.generate(input_ids=input_ids, attention_mask=torch.ones_like(input_ids),
+                                        max_new_tokens=2, do_sample=False, cache_implementation="static",
+                                        pad_token_id=self.tokenizer.eos_token_id)
+        except Exception as e:
+            self._report(f"Warning: compiled generation disabled: {e}")
+            self.model.forward = eager_forward
+            return False
+        return True
 
+    @staticmethod
+    def _resolve_adapter_path(base_model_name, adapter_path):
         # Ensure files are correct
-        if self.base_model_name == "Qwen/Qwen2.5-0.5B-Instruct":
-            self.adapter_path = "./qwen-lora-ftuned-adapted/"
-        elif self.base_model_name == "TinyLlama/TinyLlama-1.1B-Chat-v1.0":
-            self.adapter_path = "./tinyllama-lora-ftuned-adapted-v2/"
-        else: 
-            print("Error select the model")
-    
+        if base_model_name in ADAPTER_PATHS:
+            return ADAPTER_PATHS[base_model_name]
+        print(f"Unknown base model {base_model_name}, using adapter path: {adapter_path}")
+        return adapter_path
+
+    def adapter_hash(self):
+        digest = hashlib.sha256()
+        for name in ADAPTER_FILES:
+            path = os.path.join(self.adapter_path, name)
+            if not os.path.exists(path):
+                continue
+            digest.update(name.encode())
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        return digest.hexdigest()
+
+    def identity(self):
+        return {
+            "base_model": self.base_model_name,
+            "adapter_hash": self.adapter_hash(),
+            "dtype": str(self.torch_dtype),
+            "quantization": self.runtime_config.get("quantization"),
+        }
+
+    def merged_cache_path(self):
+        # The key covers everything that changes the merged weights, so a
+        # retrained adapter or another dtype never picks up stale weights.
+        key = f"{self.base_model_name}|{self.adapter_hash()}|{self.torch_dtype}"
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{self.base_model_name.replace('/', '--')}-{digest}")
+
+    @staticmethod
+    def adapter_name_from_path(adapter_path):
+        return os.path.basename(os.path.normpath(adapter_path))
+
+    def _load_adapted_model(self):
+        self._report("Loading base model...")
+        model = AutoModelForCausalLM.from_pretrained(
+            self.base_model_name,
+            device_map=self.device_map,
+            torch_dtype=self.torch_dtype,
+            trust_remote_code=True
+        )
+
+        self._report("Loading LoRA adapter...")
+        model = PeftModel.from_pretrained(model, self.adapter_path,
+                                          adapter_name=self.adapter_name_from_path(self.adapter_path))
+
+        if not self.merge_adapter:
+            return model
+
+        self._report("Merging and unloading adapter...")
+        return model.merge_and_unload()
+
+    def _save_merged_model(self, cache_path):
+        # Written to a temporary directory and renamed, so an interrupted save
+        # never leaves a half-written cache entry behind.
+        tmp_path = cache_path + ".tmp"
+        try:
+            self._report(f"Saving merged model to cache: {cache_path}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            self.model.save_pretrained(tmp_path, safe_serialization=True)
+            self.tokenizer.save_pretrained(tmp_path)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            self._report(f"Warning: could not cache merged model: {e}")
+
+    def estimate_model_bytes(self):
+        # Parameter count of an empty (meta device) model at the load dtype;
+        # an upper bound for int8-quantized models. 0 if it can't be estimated.
+        try:
+            config = AutoConfig.from_pretrained(self.base_model_name, trust_remote_code=True)
+            with init_empty_weights():
+                empty_model = AutoModelForCausalLM.from_config(config, trust_remote_code=True)
+            dtype = getattr(torch, self.torch_dtype) if isinstance(self.torch_dtype, str) else self.torch_dtype
+            return sum(p.numel() for p in empty_model.parameters()) * torch.finfo(dtype).bits // 8
+        except Exception as e:
+            self._report(f"Warning: could not estimate model size: {e}")
+            return 0
+
     def load_model(self):
-        print("Loading tokenizer...")
-        self.tokenizer = AutoTokenizer.from_pretrained(self.base_model_name)
-        
+        if self.resident_models:
+            # Room is made before loading, so peak memory stays within budget
+            self._evict_over_budget(incoming_bytes=self.estimate_model_bytes())
+
+        cache_path = self.merged_cache_path() if self.use_cache and self.merge_adapter else None
+        cached = cache_path is not None and os.path.isdir(cache_path)
+
+        self._report("Loading tokenizer...")
+        self.tokenizer = AutoTokenizer.from_pretrained(cache_path if cached else self.base_model_name)
+
         if self.tokenizer.pad_token is None:
             self.tokenizer.pad_token = self.tokenizer.eos_token
-        
-        print("Loading base model...")
-        self.model = AutoModelForCausalLM.from_pretrained(
-            self.base_model_name, 
-            device_map="auto", 
-            torch_dtype="float16", 
-            trust_remote_code=True
+        # Decoder-only models need left padding for batched generation
+        self.tokenizer.padding_side = "left"
+
+        if cached:
+            # safetensors weights are memory-mapped, and no PEFT wrapper or
+            # merge is needed, so there is no second copy of the weights.
+            self._report("Loading merged model from cache...")
+            self.model = AutoModelForCausalLM.from_pretrained(
+                cache_path,
+                device_map=self.device_map,
+                torch_dtype=self.torch_dtype,
+                trust_remote_code=True
+            )
+        else:
+            self.model = self._load_adapted_model()
+            if cache_path is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self._save_merged_model(cache_path)
+
+        if self.profile == "cpu":
+            self._apply_cpu_profile()
+
+        # Same sampling defaults as the pipeline, for direct model.generate calls
+        self.model.generation_config.update(
+            max_new_tokens=512,
+            temperature=0.7,
+            do_sample=True,
+            top_p=0.9,
+            pad_token_id=self.tokenizer.eos_token_id
         )
-        
-        print("Loading LoRA adapter...")
-        self.model = PeftModel.from_pretrained(self.model, self.adapter_path)
-        
-        print("Merging and unloading adapter...")
-        self.model = self.model.merge_and_unload()
-    
-        print("Creating chat pipeline...")
+        compiled = self.compile_generation and self._compile_generation(max_new_tokens=512)
+        self.static_cache = compiled
+
+        self.runtime_config = {
+            "profile": self.profile,
+            "device": str(self.model.device),
+            "dtype": str(self.torch_dtype),
+            "quantization": "int8-dynamic" if self.profile == "cpu" and self.quantize and self.merge_adapter else None,
+            "threads": torch.get_num_threads(),
+            "generation": "compiled-static-cache" if compiled else "eager",
+        }
+        self._report(f"Runtime configuration: {self.runtime_config}")
+
+        self._report("Creating chat pipeline...")
         self.chat_pipeline = pipeline(
             'text-generation',
             model=self.model,
             tokenizer=self.tokenizer,
-            max_new_tokens=512,  
-            temperature=0.7,     
-            do_sample=True,      
-            top_p=0.9,          
+            max_new_tokens=512,
+            temperature=0.7,
+            do_sample=True,
+            top_p=0.9,
             return_full_text=False,
             pad_token_id=self.tokenizer.eos_token_id
         )
-        
-        print("Model loaded successfully!")
+
+        self._report("Model loaded successfully!")
+        self._register_resident()
         return self.chat_pipeline
-    
+
+    def _register_resident(self):
+        self.resident_models[self.base_model_name] = {
+            "adapter_path": self.adapter_path,
+            "model": self.model,
+            "tokenizer": self.tokenizer,
+            "chat_pipeline": self.chat_pipeline,
+            "static_cache": self.static_cache,
+            "size_bytes": self.model.get_memory_footprint(),
+        }
+        self.resident_models.move_to_end(self.base_model_name)
+        self._evict_over_budget()
+
+    def resident_bytes(self):
+        return sum(entry["size_bytes"] for entry in self.resident_models.values())
+
+    def _evict_over_budget(self, incoming_bytes=0):
+        # After a load the active model is the most recently used one and is
+        # never evicted; before a load (incoming_bytes > 0) any model can be.
+        keep = 0 if incoming_bytes else 1
+        while len(self.resident_models) > keep and self.resident_bytes() + incoming_bytes > self.max_resident_bytes:
+            name, entry = self.resident_models.popitem(last=False)
+            self._report(f"Evicting {name} from memory ({entry['size_bytes'] / 1024 ** 3:.2f} GB)")
+            entry.clear()
+            release_memory()
+
+    def adapter_names(self):
+        if not isinstance(self.model, PeftModel):
+            return []
+        return list(self.model.peft_config.keys())
+
+    def add_adapter(self, adapter_name, adapter_path):
+        if not isinstance(self.model, PeftModel):
+            raise RuntimeError("Adapters can only be added when the model is loaded with merge_adapter=False")
+        self._report(f"Loading LoRA adapter '{adapter_name}' from {adapter_path}...")
+        self.model.load_adapter(adapter_path, adapter_name=adapter_name)
+        return adapter_name
+
+    def set_adapter(self, adapter_name):
+        if adapter_name not in self.adapter_names():
+            raise ValueError(f"Unknown adapter: {adapter_name}")
+        self.model.set_adapter(adapter_name)
+
+    def switch_model(self, base_model_name):
+        if base_model_name in self.resident_models:
+            self.resident_models.move_to_end(base_model_name)
+            entry = self.resident_models[base_model_name]
+            self.base_model_name = base_model_name
+            self.adapter_path = entry["adapter_path"]
+            self.model = entry["model"]
+            self.tokenizer = entry["tokenizer"]
+            self.chat_pipeline = entry["chat_pipeline"]
+            self.static_cache = entry["static_cache"]
+            self._report(f"Switched to resident model: {base_model_name}")
+            return self.chat_pipeline
+
+        # Only resident_models keeps the previous model, so evicting it frees it
+        self.model = None
+        self.tokenizer = None
+        self.chat_pipeline = None
+        self.base_model_name = base_model_name
+        self.adapter_path = self._resolve_adapter_path(base_model_name, self.adapter_path)
+        return self.load_model()
+
     def get_pipeline(self):
         if self.chat_pipeline is None:
             return self.load_model()
-        return self.chat_pipeline
\ No newline at end of file
+        return self.chat_pipeline
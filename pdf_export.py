@@ -0,0 +1,162 @@
+import importlib.util
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+PDF_STYLESHEET = """
+body { font-family: Arial, sans-serif; margin: 40px; line-height: 1.6; }
+h1 { color: #2c3e50; border-bottom: 2px solid #3498db; }
+h2 { color: #34495e; margin-top: 30px; }
+code { background-color: #f8f9fa; padding: 2px 4px; border-radius: 3px; }
+pre { background-color: #f8f9fa; padding: 15px; border-radius: 5px; overflow-x: auto; }
+"""
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>ML Interview Questions</title>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+# Set in each worker process by _init_renderer
+_renderer = None
+
+
+class _Renderer:
+    # markdown2/weasyprint are imported once per worker, and the font
+    # configuration and parsed stylesheet are reused for every render
+    def __init__(self):
+        import markdown2
+        from weasyprint import CSS, HTML
+        from weasyprint.text.fonts import FontConfiguration
+
+        self.markdown = markdown2.markdown
+        self.html = HTML
+        self.font_config = FontConfiguration()
+        self.stylesheet = CSS(string=PDF_STYLESHEET, font_config=self.font_config)
+
+    def render(self, md_content, pdf_path):
+        full_html = HTML_TEMPLATE.format(body=self.markdown(md_content))
+        self.html(string=full_html).write_pdf(pdf_path, stylesheets=[self.stylesheet], font_config=self.font_config)
+        return pdf_path
+
+
+def _init_renderer():
+    global _renderer
+    _renderer = _Renderer()
+
+
+def _render(md_content, pdf_path):
+    return _renderer.render(md_content, pdf_path)
+
+
+def split_markdown(md_content, chunk_entries):
+    """Splits a session file after every chunk_entries '---' entry separators."""
+    parts = re.split(r"(?<=\n---\n)", md_content)
+    return ["".join(parts[i:i + chunk_entries]) for i in range(0, len(parts), chunk_entries)]
+
+
+def pdf_dependencies_available():
+    return all(importlib.util.find_spec(name) is not None for name in ("markdown2", "weasyprint"))
+
+
+class PdfExporter:
+    """Renders Markdown files to PDF in a pool of worker processes.
+
+    Each worker keeps its renderer between calls. Files with more than
+    chunk_entries entries are rendered as chunks in parallel and merged with
+    pypdf when it is installed. submit() returns a future immediately, so
+    exports can run in the background.
+    """
+
+    def __init__(self, max_workers=None, chunk_entries=200):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.chunk_entries = chunk_entries
+        self.can_merge = importlib.util.find_spec("pypdf") is not None
+        self.pool = None
+        self.pool_lock = threading.Lock()
+        # Splits files and merges chunks without blocking the caller
+        self.coordinator = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def _get_pool(self):
+        with self.pool_lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_renderer
+                )
+            return self.pool
+
+    def _merge(self, part_paths, pdf_path):
+        from pypdf import PdfWriter
+
+        writer = PdfWriter()
+        for part_path in part_paths:
+            writer.append(part_path)
+        with open(pdf_path, "wb") as f:
+            writer.write(f)
+        writer.close()
+
+    def _export(self, md_filepath):
+        if not pdf_dependencies_available():
+            print("PDF generation requires markdown2 and weasyprint packages.")
+            print("Install with: pip install markdown2 weasyprint")
+            return None
+        pdf_filename = os.path.splitext(md_filepath)[0] + ".pdf"
+        tmp_filename = pdf_filename + ".tmp"
+        try:
+            with open(md_filepath, 'r', encoding='utf-8') as f:
+                md_content = f.read()
+
+            chunks = split_markdown(md_content, self.chunk_entries) if self.can_merge else [md_content]
+            pool = self._get_pool()
+            if len(chunks) == 1:
+                pool.submit(_render, md_content, tmp_filename).result()
+            else:
+                part_paths = [f"{pdf_filename}.part{i}" for i in range(len(chunks))]
+                futures = [pool.submit(_render, chunk, path) for chunk, path in zip(chunks, part_paths)]
+                try:
+                    for future in futures:
+                        future.result()
+                    self._merge(part_paths, tmp_filename)
+                finally:
+                    for path in part_paths:
+                        if os.path.exists(path):
+                            os.remove(path)
+            os.replace(tmp_filename, pdf_filename)
+
+            print(f"PDF saved to: {pdf_filename}")
+            return pdf_filename
+
+        except Exception as e:
+            print(f"Error generating PDF: {e}")
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            return None
+
+    def submit(self, md_filepath):
+        """Starts exporting in the background; the future resolves to the PDF path or None."""
+        return self.coordinator.submit(self._export, md_filepath)
+
+    def export(self, md_filepath):
+        return self.submit(md_filepath).result()
+
+    def export_many(self, md_filepaths):
+        futures = [self.submit(path) for path in md_filepaths]
+        return [future.result() for future in futures]
+
+    def close(self):
+        self.coordinator.shutdown()
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
@@ -0,0 +1,199 @@
+import array
+import hashlib
+import operator
+import os
+import sqlite3
+import threading
+import time
+
+
+# Words that carry no topic, e.g. "What is ..." vs "Explain ..."; shingles
+# made of them would match across unrelated questions
+STOP_WORDS = frozenset("""
+a an and are as at be between by can could describe do does explain for from give how i in is it its me of on
+or please should that the their there this to us was we what when where which while who why will with would you your
+""".split())
+
+
+class QuestionBank:
+    """Persistent store of generated questions with near-duplicate detection.
+
+    Each question is reduced to a MinHash signature over its content words and
+    word pairs (stop words dropped); one shake_128 digest per shingle supplies
+    its hash for every permutation. Signatures are split into LSH
+    bands whose hashes are indexed in SQLite, so a lookup only compares
+    against questions that share a band, at most max_candidates of them (the
+    ones sharing the most bands). Candidates whose estimated Jaccard
+    similarity reaches the threshold count as duplicates.
+    """
+
+    def __init__(self, path="./output/question_bank.sqlite3", threshold=0.6, num_perm=120, bands=24, ngram=2,
+                 max_candidates=64):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.ngram = ngram
+        self.max_candidates = max_candidates
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS questions ("
+            "id INTEGER PRIMARY KEY, text TEXT NOT NULL, normalized TEXT NOT NULL UNIQUE, "
+            "signature BLOB NOT NULL, practice INTEGER NOT NULL, practiced INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS bands (bucket INTEGER NOT NULL, question_id INTEGER NOT NULL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS bands_bucket ON bands (bucket)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS questions_unpracticed ON questions (practiced, id)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.commit()
+        self._reindex_if_changed()
+
+    def _reindex_if_changed(self):
+        # Signatures and buckets depend on the shingling and LSH parameters;
+        # a bank written with other ones is re-indexed from the stored text
+        scheme = f"words{self.ngram}-shake128-minhash{self.num_perm}-bands{self.bands}"
+        row = self.conn.execute("SELECT value FROM settings WHERE key = 'scheme'").fetchone()
+        if row is not None and row[0] == scheme:
+            return
+        questions = self.conn.execute("SELECT id, normalized FROM questions").fetchall()
+        if questions:
+            print(f"Re-indexing question bank ({len(questions)} questions)...")
+        self.conn.execute("DELETE FROM bands")
+        for question_id, normalized in questions:
+            signature = self.signature(normalized)
+            self.conn.execute("UPDATE questions SET signature = ? WHERE id = ?", (signature.tobytes(), question_id))
+            self._insert_buckets(question_id, signature)
+        self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('scheme', ?)", (scheme,))
+        self.conn.commit()
+
+    @staticmethod
+    def normalize(text):
+        return " ".join("".join(c if c.isalnum() else " " for c in text.lower()).split())
+
+    def shingles(self, normalized):
+        words = normalized.split()
+        # A question made only of stop words keeps them
+        words = [word for word in words if word not in STOP_WORDS] or words
+        shingles = set(words)
+        for n in range(2, self.ngram + 1):
+            shingles.update(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+        return shingles
+
+    def signature(self, normalized):
+        hashes = [
+            array.array("Q", hashlib.shake_128(shingle.encode("utf-8")).digest(8 * self.num_perm))
+            for shingle in self.shingles(normalized)
+        ]
+        return array.array("Q", map(min, zip(*hashes)))
+
+    def _buckets(self, signature):
+        # One bucket per band; the band index is part of the hash so equal
+        # values in different bands do not collide
+        buckets = []
+        for band in range(self.bands):
+            values = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(band.to_bytes(2, "little") + values.tobytes(), digest_size=8).digest()
+            buckets.append(int.from_bytes(digest, "little", signed=True))
+        return buckets
+
+    def similarity(self, first, second):
+        return sum(map(operator.eq, first, second)) / self.num_perm
+
+    def _find(self, normalized, signature):
+        row = self.conn.execute("SELECT id, text FROM questions WHERE normalized = ?", (normalized,)).fetchone()
+        if row is not None:
+            return row[0], row[1], 1.0
+        buckets = self._buckets(signature)
+        candidates = self.conn.execute(
+            "SELECT q.id, q.text, q.signature FROM questions q JOIN ("
+            "SELECT question_id, COUNT(*) AS shared FROM bands "
+            f"WHERE bucket IN ({','.join('?' * len(buckets))}) "
+            "GROUP BY question_id ORDER BY shared DESC LIMIT ?"
+            ") c ON q.id = c.question_id",
+            [*buckets, self.max_candidates]
+        ).fetchall()
+        best = None
+        for question_id, text, blob in candidates:
+            score = self.similarity(signature, array.array("Q", blob))
+            if score >= self.threshold and (best is None or score > best[2]):
+                best = (question_id, text, score)
+        return best
+
+    def find_similar(self, text):
+        """Returns (id, text, similarity) of the closest stored duplicate, or None."""
+        normalized = self.normalize(text)
+        signature = self.signature(normalized)
+        with self.lock:
+            return self._find(normalized, signature)
+
+    def _insert_buckets(self, question_id, signature):
+        self.conn.executemany(
+            "INSERT INTO bands (bucket, question_id) VALUES (?, ?)",
+            [(bucket, question_id) for bucket in self._buckets(signature)]
+        )
+
+    def add(self, text, practice=False, practiced=False):
+        """Stores the question and returns its id, or None if it is a near-duplicate."""
+        return self.add_many([text], practice, practiced)[0]
+
+    def add_many(self, texts, practice=False, practiced=False):
+        """Like add() for each text, committed as one transaction.
+
+        Texts are also checked against each other, so near-duplicates within
+        texts are stored once.
+        """
+        prepared = []
+        for text in texts:
+            normalized = self.normalize(text)
+            prepared.append((text, normalized, self.signature(normalized) if normalized else None))
+        ids = []
+        with self.lock:
+            for text, normalized, signature in prepared:
+                if not normalized or self._find(normalized, signature) is not None:
+                    ids.append(None)
+                    continue
+                cursor = self.conn.execute(
+                    "INSERT INTO questions (text, normalized, signature, practice, practiced, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (text, normalized, signature.tobytes(), int(practice), int(practiced), time.time())
+                )
+                self._insert_buckets(cursor.lastrowid, signature)
+                ids.append(cursor.lastrowid)
+            self.conn.commit()
+        return ids
+
+    def draw_unpracticed(self):
+        """Returns the oldest question not yet used in practice mode and marks it, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, text FROM questions WHERE practiced = 0 ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE questions SET practiced = 1 WHERE id = ?", (row[0],))
+            self.conn.commit()
+            return row[1]
+
+    def release(self, text):
+        """Returns a drawn or generated practice question that was never shown to the unpracticed pool."""
+        with self.lock:
+            self.conn.execute("UPDATE questions SET practiced = 0 WHERE normalized = ?", (self.normalize(text),))
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            total, unpracticed = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(practiced = 0), 0) FROM questions"
+            ).fetchone()
+        return {"questions": total, "unpracticed": unpracticed}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
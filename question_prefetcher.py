@@ -0,0 +1,93 @@
+import queue
+import threading
+
+from cancellation import GenerationCancelled
+
+
+class PrefetchedQuestion:
+    def __init__(self, question):
+        self.question = question
+        self._model_answer = None
+        self._answer_ready = threading.Event()
+
+    def set_model_answer(self, answer):
+        self._model_answer = answer
+        self._answer_ready.set()
+
+    def answer_ready(self):
+        return self._answer_ready.is_set()
+
+    def model_answer(self, timeout=None):
+        self._answer_ready.wait(timeout)
+        return self._model_answer
+
+
+class QuestionPrefetcher:
+    """Keeps a small queue of practice questions generated in the background.
+
+    While the user reads and answers one question, a producer thread fills
+    the queue and, with with_answers=True, also prepares the model answer of
+    each queued question.
+    """
+
+    def __init__(self, interview_functions, size=2, with_answers=True):
+        self.interview_functions = interview_functions
+        self.with_answers = with_answers
+        self.queue = queue.Queue(maxsize=size)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._produce, daemon=True)
+            self.thread.start()
+        return self
+
+    def _put(self, item):
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        while not self.stop_event.is_set():
+            try:
+                item = PrefetchedQuestion(self.interview_functions.generate_question(practice=True))
+            except GenerationCancelled:
+                continue
+            if not self._put(item):
+                self.interview_functions.release_question(item.question)
+                break
+            if self.with_answers:
+                try:
+                    answer = self.interview_functions.answer_question(item.question)
+                except GenerationCancelled:
+                    answer = None
+                item.set_model_answer(answer)
+
+    def ready(self):
+        return self.queue.qsize()
+
+    def get(self):
+        self.start()
+        return self.queue.get()
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        # Don't wait for an in-flight generation to use its full token budget
+        self.interview_functions.cancel_generation()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+        # Questions drawn from the bank are marked practiced; the ones never
+        # handed out go back to the unseen pool
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self.interview_functions.release_question(item.question)
@@ -0,0 +1,111 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from model_loader import ModelLoader
+from interview_functions import InterviewFunctions
+from generation_utils import release_memory
+
+
+# Set in each worker process by _init_worker
+_worker_functions = None
+
+
+def _init_worker(loader_options, batch_size):
+    global _worker_functions
+    model_loader = ModelLoader(**loader_options)
+    _worker_functions = InterviewFunctions(model_loader.load_model(), batch_size=batch_size)
+
+
+def _run_job(kind, payload):
+    if kind == "question":
+        count, practice = payload
+        return [q["question"] for q in _worker_functions.generate_question_batch(count, practice=practice)]
+    if kind == "answer":
+        return _worker_functions.answer_questions(payload)
+    if kind == "review":
+        return _worker_functions.review_answers(payload)
+    raise ValueError(f"Unknown job kind: {kind}")
+
+
+class ReplicaPool:
+    """Worker processes that each hold a model replica with pinned CPU threads.
+
+    Jobs are sharded across the workers. The merged model is written to the
+    ModelLoader cache before the workers start, so every replica loads the
+    same memory-mapped safetensors file and shares its pages in the OS page
+    cache instead of each worker merging its own copy.
+    """
+
+    def __init__(self, num_workers=None, threads_per_worker=None, loader_options=None, batch_size=8):
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers or max(1, cpu_count // 4)
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.num_workers)
+        self.batch_size = batch_size
+        # The CPU profile is what applies num_threads, so it overrides a
+        # caller's profile
+        self.loader_options = {**(loader_options or {}), "profile": "cpu", "num_threads": self.threads_per_worker}
+
+        self._prepare_shared_weights()
+        print(f"Starting {self.num_workers} model workers with {self.threads_per_worker} threads each...")
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.loader_options, batch_size)
+        )
+
+    def _prepare_shared_weights(self):
+        model_loader = ModelLoader(**self.loader_options)
+        if not model_loader.use_cache or not model_loader.merge_adapter:
+            return
+        if os.path.isdir(model_loader.merged_cache_path()):
+            return
+        print("Building merged model cache for the workers...")
+        model_loader.load_model()
+        del model_loader
+        release_memory()
+
+    def _chunks(self, items):
+        size = min(self.batch_size, max(1, math.ceil(len(items) / self.num_workers)))
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    def _map(self, kind, payloads):
+        futures = [self.executor.submit(_run_job, kind, payload) for payload in payloads]
+        return [future.result() for future in futures]
+
+    def generate_question_batch(self, num_questions=5, batch_size=None, practice=False):
+        sizes = [len(chunk) for chunk in self._chunks(list(range(num_questions)))]
+        print(f"Generating {num_questions} questions on {self.num_workers} workers...")
+        results = self._map("question", [(size, practice) for size in sizes])
+        questions = []
+        for question in (q for chunk in results for q in chunk):
+            questions.append({
+                "id": len(questions) + 1,
+                "question": question,
+                "timestamp": datetime.now().isoformat()
+            })
+        return questions
+
+    def answer_questions(self, user_questions, adapters=None):
+        if adapters is not None:
+            raise ValueError("Per-request adapters are not supported by the replica pool")
+        results = self._map("answer", self._chunks(list(user_questions)))
+        return [answer for chunk in results for answer in chunk]
+
+    def review_answers(self, qa_pairs, adapters=None):
+        if adapters is not None:
+            raise ValueError("Per-request adapters are not supported by the replica pool")
+        results = self._map("review", self._chunks(list(qa_pairs)))
+        return [review for chunk in results for review in chunk]
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
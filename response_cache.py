@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """On-disk cache of generated answers with size-based LRU eviction and a TTL."""
+
+    def __init__(self, path="./output/response_cache.sqlite3", max_size_mb=64, ttl_seconds=7 * 24 * 3600):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self.conn.commit()
+
+    @staticmethod
+    def normalize(text):
+        return " ".join(text.lower().split()).rstrip("?.! ")
+
+    def make_key(self, text, model_identity, sampling):
+        payload = json.dumps({
+            "text": self.normalize(text),
+            "model": model_identity,
+            "sampling": sampling,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, value):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        while total > self.max_size_bytes:
+            oldest = self.conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                if total <= self.max_size_bytes:
+                    break
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "size_bytes": size}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
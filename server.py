@@ -0,0 +1,279 @@
+"""
+ML Interview Assistant - Local HTTP Server
+Serves question generation, answering and review from one loaded model,
+batching concurrent requests together.
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from model_loader import ModelLoader
+from interview_functions import ANSWER_ERROR, QUESTION_ERROR, REVIEW_ERROR, InterviewFunctions
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class GenerationError(Exception):
+    pass
+
+
+class ScheduledRequest:
+    def __init__(self, kind, payload, timeout):
+        self.kind = kind
+        self.payload = payload
+        self.deadline = time.monotonic() + timeout
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def expired(self):
+        return time.monotonic() > self.deadline
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.done.set()
+
+    def finish_unless(self, result, failed):
+        # InterviewFunctions returns an error string for failed generations
+        if failed:
+            self.finish(error=GenerationError(f"{self.kind.capitalize()} generation failed"))
+        else:
+            self.finish(result)
+
+
+class BatchScheduler:
+    """Collects concurrent requests over a short window and runs them as batches.
+
+    The queue is bounded (back-pressure: submit raises QueueFullError when it
+    is full) and each request has a deadline; requests that expire while
+    queued are dropped instead of being generated.
+    """
+
+    def __init__(self, interview_functions, max_batch_size=8, batch_window=0.02, max_queue=64):
+        self.interview_functions = interview_functions
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def submit(self, kind, payload, timeout=60.0):
+        request = ScheduledRequest(kind, payload, timeout)
+        try:
+            self.queue.put_nowait(request)
+        except queue.Full:
+            raise QueueFullError("Server is busy, try again later")
+        if not request.done.wait(timeout):
+            raise TimeoutError(f"Request timed out after {timeout:.0f}s")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect_batch(self):
+        try:
+            first = self.queue.get(timeout=0.2)
+        except queue.Empty:
+            return []
+        batch = [first]
+        window_end = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = window_end - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            batch = [request for request in self._collect_batch() if not request.expired()]
+            groups = {}
+            for request in batch:
+                key = (request.kind, request.payload.get("practice", False))
+                groups.setdefault(key, []).append(request)
+            for (kind, practice), requests in groups.items():
+                try:
+                    self._run_group(kind, practice, requests)
+                except Exception as e:
+                    for request in requests:
+                        request.finish(error=e)
+
+    def _adapters(self, requests):
+        if all(request.payload.get("adapter") is None for request in requests):
+            return None
+        default = getattr(self.interview_functions.chat_pipeline.model, "active_adapter", None)
+        return [request.payload.get("adapter") or default for request in requests]
+
+    def _run_group(self, kind, practice, requests):
+        if kind == "question":
+            counts = [request.payload.get("count", 1) for request in requests]
+            questions = self.interview_functions.generate_question_batch(sum(counts), practice=practice)
+            start = 0
+            for request, count in zip(requests, counts):
+                result = [q["question"] for q in questions[start:start + count]]
+                request.finish_unless(result, QUESTION_ERROR in result)
+                start += count
+        elif kind == "answer":
+            results = self.interview_functions.answer_questions(
+                [request.payload["question"] for request in requests], adapters=self._adapters(requests)
+            )
+            for request, answer in zip(requests, results):
+                request.finish_unless(answer, answer == ANSWER_ERROR)
+        elif kind == "review":
+            results = self.interview_functions.review_answers(
+                [(request.payload["question"], request.payload["answer"]) for request in requests],
+                adapters=self._adapters(requests)
+            )
+            for request, review in zip(requests, results):
+                request.finish_unless(review, review == REVIEW_ERROR)
+
+
+REQUIRED_FIELDS = {
+    "/question": [],
+    "/answer": ["question"],
+    "/review": ["question", "answer"],
+}
+
+MAX_QUESTIONS_PER_REQUEST = 50
+
+
+class InterviewRequestHandler(BaseHTTPRequestHandler):
+    scheduler = None
+    request_timeout = 60.0
+    # Adapters a request may name; empty for a merged model
+    adapter_names = ()
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "queued": self.scheduler.queue.qsize()})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path not in REQUIRED_FIELDS:
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            timeout = min(float(payload.get("timeout", self.request_timeout)), self.request_timeout)
+        except (ValueError, TypeError, AttributeError):
+            self._send_json(400, {"error": "Request body must be a JSON object"})
+            return
+        missing = [field for field in REQUIRED_FIELDS[self.path] if not payload.get(field)]
+        if missing:
+            self._send_json(400, {"error": f"Missing fields: {', '.join(missing)}"})
+            return
+
+        count = payload.get("count", 1)
+        if not isinstance(count, int) or not 1 <= count <= MAX_QUESTIONS_PER_REQUEST:
+            self._send_json(400, {"error": f"count must be between 1 and {MAX_QUESTIONS_PER_REQUEST}"})
+            return
+        # Checked here so one bad request can't fail the batch it is grouped with
+        adapter = payload.get("adapter")
+        if adapter is not None and (not isinstance(adapter, str) or adapter not in self.adapter_names):
+            self._send_json(400, {"error": f"Unknown adapter: {adapter}"})
+            return
+
+        kind = self.path.lstrip("/")
+        try:
+            result = self.scheduler.submit(kind, payload, timeout)
+        except QueueFullError as e:
+            self._send_json(503, {"error": str(e)})
+        except TimeoutError as e:
+            self._send_json(504, {"error": str(e)})
+        except GenerationError as e:
+            self._send_json(500, {"error": str(e)})
+        except Exception as e:
+            print(f"ERROR in {kind} request: {e}")
+            self._send_json(500, {"error": str(e)})
+        else:
+            key = "questions" if kind == "question" else kind
+            self._send_json(200, {key: result})
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ML Interview Assistant HTTP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model", default="Qwen/Qwen2.5-0.5B-Instruct", help="Base model name")
+    parser.add_argument("--profile", choices=["default", "cpu"], default="default")
+    parser.add_argument("--quantize", action="store_true")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--adapter", action="append", default=[], metavar="NAME=PATH",
+                        help="Extra LoRA adapter requests can select with \"adapter\"; "
+                             "loads the model unmerged (repeatable)")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--batch-window-ms", type=float, default=20,
+                        help="How long to wait for more requests before running a batch")
+    parser.add_argument("--max-queue", type=int, default=64,
+                        help="Queued requests beyond this are rejected with 503")
+    parser.add_argument("--timeout", type=float, default=120,
+                        help="Per-request timeout in seconds (504 when exceeded)")
+    return parser.parse_args()
+
+
+def main():
+    """Server entry point"""
+    args = parse_args()
+    adapters = []
+    for spec in args.adapter:
+        name, sep, path = spec.partition("=")
+        if not sep or not name or not path:
+            print(f"ERROR: --adapter must be NAME=PATH, got: {spec}")
+            return
+        adapters.append((name, path))
+
+    # Per-request adapters need the unmerged PeftModel
+    model_loader = ModelLoader(base_model_name=args.model, profile=args.profile, quantize=args.quantize,
+                               num_threads=args.threads, merge_adapter=not adapters)
+    chat_pipeline = model_loader.load_model()
+    for name, path in adapters:
+        model_loader.add_adapter(name, path)
+    interview_functions = InterviewFunctions(chat_pipeline, batch_size=args.max_batch_size)
+    scheduler = BatchScheduler(interview_functions, max_batch_size=args.max_batch_size,
+                               batch_window=args.batch_window_ms / 1000, max_queue=args.max_queue).start()
+
+    InterviewRequestHandler.scheduler = scheduler
+    InterviewRequestHandler.request_timeout = args.timeout
+    InterviewRequestHandler.adapter_names = frozenset(model_loader.adapter_names())
+    if adapters:
+        print(f"Adapters: {', '.join(model_loader.adapter_names())}")
+    server = ThreadingHTTPServer((args.host, args.port), InterviewRequestHandler)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class SessionJournal:
+    """Append-only JSONL journal of one session's entries.
+
+    Entries are written and flushed as they are produced, so they survive the
+    process dying; fsync is batched to every sync_every entries, and a timer
+    syncs any pending entries sync_interval seconds after the first of them. Readers stream the file from
+    a byte offset, so rendering only ever touches new entries.
+    """
+
+    def __init__(self, path, sync_every=8, sync_interval=2.0):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.entries = sum(1 for _ in self.read_from(0)) if os.path.exists(path) else 0
+        self.file = open(path, "a", encoding="utf-8")
+        self.pending = 0
+        self.timer = None
+
+    def __len__(self):
+        return self.entries
+
+    def append(self, entry):
+        entry = {"timestamp": datetime.now().isoformat(), **entry}
+        with self.lock:
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.file.flush()
+            self.entries += 1
+            self.pending += 1
+            if self.pending >= self.sync_every:
+                self._sync()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.sync_interval, self.sync)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def sync(self):
+        with self.lock:
+            if self.pending and not self.file.closed:
+                self._sync()
+
+    def read_from(self, offset):
+        """Yields (next_offset, entry) for every complete line after offset."""
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    yield offset, json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            self._sync()
+            self.file.close()